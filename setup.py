@@ -29,7 +29,12 @@ setup(
     packages=["xphyle"],
     setup_requires=["setuptools_scm"],
     install_requires=["pokrok"],
-    extras_require={"performance": ["lorem"], "zstd": ["zstandard"]},
+    extras_require={
+        "performance": ["lorem", "numpy"],
+        "zstd": ["zstandard"],
+        "pandas": ["pandas"],
+        "isal": ["isal"],
+    },
     tests_require=["pytest", "pytest-cov"],
     classifiers=[
         "Development Status :: 5 - Production/Stable",
@@ -1,33 +1,56 @@
 from contextlib import contextmanager
-from io import BytesIO, TextIOWrapper, BufferedIOBase
+from io import BytesIO, StringIO, TextIOWrapper, BufferedIOBase
+import os
 import random
+import socket
 from typing import cast
 from unittest.mock import patch
-import urllib.request
 
 
 # Note: the casts of StringIO/BytesIO to BufferedIOBase are only necessary because of
 # pycharm bug PY-28155
 
 
+PRINTABLE_CHARS = [chr(i) for i in range(32, 127)]
+# A dedicated, seeded generator makes generated test data reproducible
+_RNG = random.Random(0xC0FFEE)
+
+
+def _generate_text(n):
+    return ''.join(_RNG.choices(PRINTABLE_CHARS, k=n))
+
+
+# Tests only need arbitrary printable text, so most calls return a slice of a
+# pre-generated pool rather than generating new text
+_TEXT_POOL = _generate_text(64 * 1024)
+
+
 def random_text(n=1024):
-    return ''.join(chr(random.randint(32, 126)) for _ in range(n))
+    if n > len(_TEXT_POOL):
+        return _generate_text(n)
+    start = _RNG.randrange(len(_TEXT_POOL) - n + 1)
+    return _TEXT_POOL[start:start + n]
 
 
 class MockStdout(object):
     def __init__(self, name, as_bytes):
-        self.bytes_io = BytesIO()
-        object.__setattr__(self.bytes_io, 'name', name)
-        self.wrapper = TextIOWrapper(cast(BufferedIOBase, self.bytes_io))
-        self.wrapper.mode = 'w'
         self.as_bytes = as_bytes
+        if as_bytes:
+            # need a binary buffer for writing bytes via sys.stdout.buffer
+            self.bytes_io = BytesIO()
+            object.__setattr__(self.bytes_io, 'name', name)
+            self.wrapper = TextIOWrapper(cast(BufferedIOBase, self.bytes_io))
+        else:
+            # text-only output can be captured without encoding/decoding
+            self.wrapper = StringIO()
+            object.__setattr__(self.wrapper, 'name', name)
+        self.wrapper.mode = 'w'
 
     def getvalue(self):
-        self.wrapper.flush()
-        val = self.bytes_io.getvalue()
         if not self.as_bytes:
-            val = val.decode()
-        return val
+            return self.wrapper.getvalue()
+        self.wrapper.flush()
+        return self.bytes_io.getvalue()
 
 
 @contextmanager
@@ -47,24 +70,36 @@ def intercept_stderr(as_bytes=False):
 @contextmanager
 def intercept_stdin(content, is_bytes=False):
     if not is_bytes:
+        if not content.endswith('\n'):
+            content += '\n'
         content = content.encode()
-    i = BytesIO()
+    # xopen reads sys.stdin.buffer to guess the compression format, so text
+    # input still needs to be backed by a byte stream
+    i = BytesIO(content)
     object.__setattr__(i, 'name', '<stdin>')
-    i.write(content)
-    if not (is_bytes or content.endswith(b'\n')):
-        i.write(b'\n')
-    i.seek(0)
     i = TextIOWrapper(cast(BufferedIOBase, i))
     i.mode = 'r'
     with patch('sys.stdin', i):
         yield
 
 
+_NO_INTERNET = None
+
+
 def no_internet():
-    """Test whether there's no internet connection available.
+    """Test whether there's no internet connection available. The network is
+    only probed once per session; set XPHYLE_NO_INTERNET=1 to skip the probe.
     """
-    try:
-        urllib.request.urlopen("https://github.com").info()
-        return False
-    except:
-        return True
+    global _NO_INTERNET
+    if _NO_INTERNET is None:
+        if os.environ.get("XPHYLE_NO_INTERNET") == "1":
+            _NO_INTERNET = True
+        else:
+            # A TCP connection is enough to tell whether the network is up,
+            # and avoids a full TLS handshake and HTTP request
+            try:
+                socket.create_connection(("github.com", 443), timeout=1).close()
+                _NO_INTERNET = False
+            except OSError:
+                _NO_INTERNET = True
+    return _NO_INTERNET
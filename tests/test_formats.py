@@ -1,12 +1,22 @@
 from unittest import TestCase, skipIf
+import functools
 import gzip
+import importlib.util
 import string
 import sys
 from xphyle.formats import *
 from xphyle.paths import TempDir, EXECUTABLE_CACHE
+from xphyle.progress import copy_file_chunked
 from . import *
 
 
+# The compression tests only need opaque input, so generate it once
+_CORPUS_TEXT = random_text()
+_CORPUS_BYTES = _CORPUS_TEXT.encode()
+
+
+# The format table doesn't change during a run, so each lookup is only done once
+@functools.lru_cache(maxsize=None)
 def get_format(ext):
     return FORMATS.get_compression_format(FORMATS.guess_compression_format(ext))
 
@@ -23,13 +33,11 @@ def read_file(fmt, path, use_system, mode="rt"):
 
 def create_truncated_file(path, fmt):
     # Random text
-    text = "".join(random.choice(string.ascii_lowercase) for _ in range(200))
+    text = "".join(random.choices(string.ascii_lowercase, k=200))
     f = fmt.open_file(path, "w")
     f.write(text)
     f.close()
-    f = open(path, "a")
-    f.truncate(os.stat(path).st_size - 10)
-    f.close()
+    os.truncate(path, os.path.getsize(path) - 10)
 
 
 gz_path = get_format("gz").executable_path
@@ -42,28 +50,37 @@ bz_path = get_format("bz2").executable_path
 no_pbzip2 = bz_path is None or get_format("bz2").executable_name != "pbzip2"
 xz_path = get_format("xz").executable_path
 zstd_path = get_format("zstd").executable_path
+no_zstandard = importlib.util.find_spec("zstandard") is None
 
 
 class ThreadsTests(TestCase):
     def test_threads(self):
         threads = ThreadsVar(default_value=2)
         threads.update(None)
-        assert 2 == threads.threads
+        self.assertEqual(2, threads.threads)
         threads.update(False)
-        assert 1 == threads.threads
+        self.assertEqual(1, threads.threads)
         threads.update(0)
-        assert 1 == threads.threads
-        import multiprocessing
-
+        self.assertEqual(1, threads.threads)
         threads.update(True)
-        assert multiprocessing.cpu_count() == threads.threads
+        self.assertEqual(os.cpu_count(), threads.threads)
         threads.update(4)
-        assert 4 == threads.threads
+        self.assertEqual(4, threads.threads)
+
+    def test_resolve(self):
+        threads = ThreadsVar(default_value=2)
+        self.assertEqual(2, threads.resolve())
+        self.assertEqual(2, threads.resolve(None))
+        self.assertEqual(1, threads.resolve(False))
+        self.assertEqual(1, threads.resolve(0))
+        self.assertEqual(3, threads.resolve(3))
+        self.assertEqual(os.cpu_count(), threads.resolve(True))
+        self.assertEqual(2, threads.threads)
 
 
 class CompressionTests(TestCase):
     def tearDown(self):
-        EXECUTABLE_CACHE.cache = {}
+        EXECUTABLE_CACHE.cache.clear()
         THREADS.update(1)
 
     def test_list_formats(self):
@@ -92,11 +109,42 @@ class CompressionTests(TestCase):
             },
             set(FORMATS.list_extensions(True)),
         )
+        # the result is a copy of the cached extensions, so modifying it does
+        # not affect later calls
+        exts = FORMATS.list_extensions(True)
+        exts.add(".foo")
+        self.assertNotIn(".foo", FORMATS.list_extensions(True))
+        self.assertSetEqual(
+            {"gz", "bgz", "bz2", "bzip", "bzip2", "xz", "lzma", "7z", "7zip", "zst",
+             "br"},
+            set(FORMATS.list_extensions()),
+        )
 
     def test_guess_format(self):
-        assert "gzip" == FORMATS.guess_compression_format("gz")
-        assert "gzip" == FORMATS.guess_compression_format(".gz")
-        assert "gzip" == FORMATS.guess_compression_format("foo.gz")
+        self.assertEqual("gzip", FORMATS.guess_compression_format("gz"))
+        self.assertEqual("gzip", FORMATS.guess_compression_format(".gz"))
+        self.assertEqual("gzip", FORMATS.guess_compression_format("foo.gz"))
+
+    def test_guess_format_from_header_bytes(self):
+        self.assertEqual(
+            "gzip", FORMATS.guess_format_from_header_bytes(b"\x1f\x8b\x08\x00")
+        )
+        self.assertEqual(
+            "bgzip", FORMATS.guess_format_from_header_bytes(b"\x1f\x8b\x08\x04")
+        )
+        self.assertEqual("bz2", FORMATS.guess_format_from_header_bytes(b"BZh9"))
+        self.assertEqual(
+            "lzma", FORMATS.guess_format_from_header_bytes(b"\xfd7zXZ\x00\x00")
+        )
+        self.assertEqual(
+            "zstd", FORMATS.guess_format_from_header_bytes(b"\x28\xb5\x2f\xfd")
+        )
+        self.assertIsNone(FORMATS.guess_format_from_header_bytes(b""))
+        self.assertIsNone(FORMATS.guess_format_from_header_bytes(b"\x1f"))
+        num_magic = len(FORMATS.magic_bytes)
+        self.assertIsNone(FORMATS.guess_format_from_header_bytes(b"foo"))
+        # lookups must not add entries to the magic bytes table
+        self.assertEqual(num_magic, len(FORMATS.magic_bytes))
 
     def test_invalid_format(self):
         self.assertIsNone(FORMATS.guess_compression_format("foo"))
@@ -112,196 +160,230 @@ class CompressionTests(TestCase):
     # test all possible scenarios
 
     def _test_format(self, fmt):
-        assert fmt.default_compresslevel == fmt._get_compresslevel(None)
-        assert fmt.compresslevel_range[0] == fmt._get_compresslevel(-1)
-        assert fmt.compresslevel_range[1] == fmt._get_compresslevel(100)
+        self.assertEqual(fmt.default_compresslevel, fmt._get_compresslevel(None))
+        self.assertEqual(fmt.compresslevel_range[0], fmt._get_compresslevel(-1))
+        self.assertEqual(fmt.compresslevel_range[1], fmt._get_compresslevel(100))
+
+    def _test_commands(self, fmt, exe_path, cases):
+        exe = str(exe_path)
+        for args, kwargs, expected in cases:
+            with self.subTest(args=args, kwargs=kwargs):
+                self.assertEqual(fmt.get_command(*args, **kwargs), [exe] + expected)
 
     @skipIf(gz_path is None, "'gzip' not available")
     def test_gzip(self):
         gz = get_format("gz")
         self._test_format(gz)
-        assert gz.default_ext == "gz"
-        self.assertEqual(
-            gz.get_command("c", compresslevel=5), [str(gz_path), "-5", "-c"]
-        )
-        self.assertEqual(
-            gz.get_command("c", "foo.bar", compresslevel=5),
-            [str(gz_path), "-5", "-c", "foo.bar"],
-        )
-        self.assertEqual(gz.get_command("d"), [str(gz_path), "-d", "-c"])
-        self.assertEqual(
-            gz.get_command("d", "foo.gz"), [str(gz_path), "-d", "-c", "foo.gz"]
+        self.assertEqual(gz.default_ext, "gz")
+        self._test_commands(
+            gz,
+            gz_path,
+            [
+                (("c",), dict(compresslevel=5), ["-5", "-c"]),
+                (("c", "foo.bar"), dict(compresslevel=5), ["-5", "-c", "foo.bar"]),
+                (("d",), {}, ["-d", "-c"]),
+                (("d", "foo.gz"), {}, ["-d", "-c", "foo.gz"]),
+            ],
         )
 
     @skipIf(no_pigz, "'pigz' not available")
     def test_pigz(self):
         THREADS.update(2)
         gz = get_format("gz")
-        assert gz.default_ext == "gz"
-        self.assertEqual(
-            gz.get_command("c", compresslevel=5), [str(gz_path), "-5", "-c", "-p", "2"]
+        self.assertEqual(gz.default_ext, "gz")
+        self._test_commands(
+            gz,
+            gz_path,
+            [
+                (("c",), dict(compresslevel=5), ["-5", "-c", "-p", "2"]),
+                (
+                    ("c", "foo.bar"),
+                    dict(compresslevel=5),
+                    ["-5", "-c", "-p", "2", "foo.bar"],
+                ),
+                (("d",), {}, ["-d", "-c"]),
+                (("d", "foo.gz"), {}, ["-d", "-c", "foo.gz"]),
+            ],
         )
-        self.assertEqual(
-            gz.get_command("c", "foo.bar", compresslevel=5),
-            [str(gz_path), "-5", "-c", "-p", "2", "foo.bar"],
-        )
-        self.assertEqual(gz.get_command("d"), [str(gz_path), "-d", "-c"])
-        self.assertEqual(
-            gz.get_command("d", "foo.gz"), [str(gz_path), "-d", "-c", "foo.gz"]
+
+    @skipIf(no_pigz, "'pigz' not available")
+    def test_pigz_all_cores(self):
+        THREADS.update(True)
+        threads = os.cpu_count()
+        expected = ["-5", "-c"]
+        if threads > 1:
+            expected.extend(("-p", str(threads)))
+        self._test_commands(
+            get_format("gz"), gz_path, [(("c",), dict(compresslevel=5), expected)]
         )
 
     @skipIf(no_igzip, "'igzip' not available")
     def test_igzip(self):
         THREADS.update(2)
         gz = get_format("gz")
-        assert gz.default_ext == "gz"
-        self.assertEqual(
-            gz.get_command("c", compresslevel=2), [str(gz_path), "-2", "-c", "-T", "2"]
-        )
-        self.assertEqual(
-            gz.get_command("c", "foo.bar", compresslevel=2),
-            [str(gz_path), "-2", "-c", "-T", "2", "foo.bar"],
-        )
-        self.assertEqual(gz.get_command("d"), [str(gz_path), "-d", "-c"])
-        self.assertEqual(
-            gz.get_command("d", "foo.gz"), [str(gz_path), "-d", "-c", "foo.gz"]
+        self.assertEqual(gz.default_ext, "gz")
+        self._test_commands(
+            gz,
+            gz_path,
+            [
+                (("c",), dict(compresslevel=2), ["-2", "-c", "-T", "2"]),
+                (
+                    ("c", "foo.bar"),
+                    dict(compresslevel=2),
+                    ["-2", "-c", "-T", "2", "foo.bar"],
+                ),
+                (("d",), {}, ["-d", "-c"]),
+                (("d", "foo.gz"), {}, ["-d", "-c", "foo.gz"]),
+            ],
         )
 
     @skipIf(bgz_compress_path is None, "'bgzip' not available")
     def test_bgzip_compress(self):
         THREADS.update(2)
         bgz = get_format("bgz")
-        assert bgz.default_ext == "bgz"
-        self.assertEqual(
-            bgz.get_command("c"), [str(bgz_compress_path), "-l", "4", "-c", "-@", "2"]
-        )
-        self.assertEqual(
-            bgz.get_command("c", "foo.bar", compresslevel=5),
-            [str(bgz_compress_path), "-l", "5", "-c", "-@", "2", "foo.bar"],
+        self.assertEqual(bgz.default_ext, "bgz")
+        self._test_commands(
+            bgz,
+            bgz_compress_path,
+            [
+                (("c",), {}, ["-l", "4", "-c", "-@", "2"]),
+                (
+                    ("c", "foo.bar"),
+                    dict(compresslevel=5),
+                    ["-l", "5", "-c", "-@", "2", "foo.bar"],
+                ),
+            ],
         )
 
     @skipIf(bgz_decompress_path is None, "'gzip/pigz' not available")
     def test_bgzip_decompress(self):
         THREADS.update(2)
-        bgz = get_format("bgz")
-        if bgz.decompress_name == "pigz":
-            self.assertEqual(
-                bgz.get_command("d"), [str(bgz_decompress_path), "-d", "-c"]
-            )
-            self.assertEqual(
-                bgz.get_command("d", PurePath("foo.gz")),
-                [str(bgz_decompress_path), "-d", "-c", "foo.gz"],
-            )
-            self.assertEqual(
-                bgz.get_command("d", PurePath("foo.bar")),
-                [str(bgz_decompress_path), "-d", "-c", "-S", ".bar", "foo.bar"],
-            )
-        else:
-            self.assertEqual(
-                bgz.get_command("d"), [str(bgz_decompress_path), "-d", "-c"]
-            )
-            self.assertEqual(
-                bgz.get_command("d", PurePath("foo.gz")),
-                [str(bgz_decompress_path), "-d", "-c", "foo.gz"],
-            )
-            self.assertEqual(
-                bgz.get_command("d", PurePath("foo.bar")),
-                [str(bgz_decompress_path), "-d", "-c", "-S", ".bar", "foo.bar"],
-            )
+        self._test_commands(
+            get_format("bgz"),
+            bgz_decompress_path,
+            [
+                (("d",), {}, ["-d", "-c"]),
+                (("d", PurePath("foo.gz")), {}, ["-d", "-c", "foo.gz"]),
+                (
+                    ("d", PurePath("foo.bar")),
+                    {},
+                    ["-d", "-c", "-S", ".bar", "foo.bar"],
+                ),
+            ],
+        )
 
     @skipIf(bz_path is None, "'bzip2' not available")
     def test_bzip2(self):
         bz = get_format("bz2")
         self._test_format(bz)
-        assert bz.default_ext == "bz2"
-        self.assertEqual(
-            bz.get_command("c", compresslevel=5), [str(bz_path), "-5", "-z", "-c"]
-        )
-        self.assertEqual(
-            bz.get_command("c", "foo.bar", compresslevel=5),
-            [str(bz_path), "-5", "-z", "-c", "foo.bar"],
-        )
-        self.assertEqual(bz.get_command("d"), [str(bz_path), "-d", "-c"])
-        self.assertEqual(
-            bz.get_command("d", "foo.bz2"), [str(bz_path), "-d", "-c", "foo.bz2"]
+        self.assertEqual(bz.default_ext, "bz2")
+        self._test_commands(
+            bz,
+            bz_path,
+            [
+                (("c",), dict(compresslevel=5), ["-5", "-z", "-c"]),
+                (
+                    ("c", "foo.bar"),
+                    dict(compresslevel=5),
+                    ["-5", "-z", "-c", "foo.bar"],
+                ),
+                (("d",), {}, ["-d", "-c"]),
+                (("d", "foo.bz2"), {}, ["-d", "-c", "foo.bz2"]),
+            ],
         )
 
     @skipIf(no_pbzip2, "'pbzip2' not available")
     def test_pbzip2(self):
         THREADS.update(2)
         bz = get_format("bz2")
-        assert bz.default_ext == "bz2"
-        self.assertEqual(
-            bz.get_command("c", compresslevel=5),
-            [str(bz_path), "-5", "-z", "-c", "-p2"],
-        )
-        self.assertEqual(
-            bz.get_command("c", "foo.bar", compresslevel=5),
-            [str(bz_path), "-5", "-z", "-c", "-p2", "foo.bar"],
-        )
-        self.assertEqual(bz.get_command("d"), [str(bz_path), "-d", "-c", "-p2"])
-        self.assertEqual(
-            bz.get_command("d", "foo.bz2"), [str(bz_path), "-d", "-c", "-p2", "foo.bz2"]
+        self.assertEqual(bz.default_ext, "bz2")
+        self._test_commands(
+            bz,
+            bz_path,
+            [
+                (("c",), dict(compresslevel=5), ["-5", "-z", "-c", "-p2"]),
+                (
+                    ("c", "foo.bar"),
+                    dict(compresslevel=5),
+                    ["-5", "-z", "-c", "-p2", "foo.bar"],
+                ),
+                (("d",), {}, ["-d", "-c", "-p2"]),
+                (("d", "foo.bz2"), {}, ["-d", "-c", "-p2", "foo.bz2"]),
+            ],
         )
 
     @skipIf(xz_path is None, "'xz' not available")
     def test_lzma(self):
         xz = get_format("xz")
         self._test_format(xz)
-        assert xz.default_ext == "xz"
-        self.assertEqual(
-            xz.get_command("c", compresslevel=5), [str(xz_path), "-5", "-z", "-c"]
-        )
-        self.assertEqual(
-            xz.get_command("c", "foo.bar", compresslevel=5),
-            [str(xz_path), "-5", "-z", "-c", "foo.bar"],
-        )
-        self.assertEqual(xz.get_command("d"), [str(xz_path), "-d", "-c"])
-        self.assertEqual(
-            xz.get_command("d", "foo.xz"), [str(xz_path), "-d", "-c", "foo.xz"]
+        self.assertEqual(xz.default_ext, "xz")
+        self._test_commands(
+            xz,
+            xz_path,
+            [
+                (("c",), dict(compresslevel=5), ["-5", "-z", "-c"]),
+                (
+                    ("c", "foo.bar"),
+                    dict(compresslevel=5),
+                    ["-5", "-z", "-c", "foo.bar"],
+                ),
+                (("d",), {}, ["-d", "-c"]),
+                (("d", "foo.xz"), {}, ["-d", "-c", "foo.xz"]),
+            ],
         )
         # Test with threads
         THREADS.update(2)
-        self.assertEqual(
-            xz.get_command("c", compresslevel=5),
-            [str(xz_path), "-5", "-z", "-c", "-T", "2"],
-        )
-        self.assertEqual(
-            xz.get_command("c", "foo.bar", compresslevel=5),
-            [str(xz_path), "-5", "-z", "-c", "-T", "2", "foo.bar"],
+        self._test_commands(
+            xz,
+            xz_path,
+            [
+                (("c",), dict(compresslevel=5), ["-5", "-z", "-c", "-T", "2"]),
+                (
+                    ("c", "foo.bar"),
+                    dict(compresslevel=5),
+                    ["-5", "-z", "-c", "-T", "2", "foo.bar"],
+                ),
+                (("d",), {}, ["-d", "-c", "-T", "2"]),
+            ],
         )
-        self.assertEqual(xz.get_command("d"), [str(xz_path), "-d", "-c", "-T", "2"])
 
     @skipIf(zstd_path is None, "'zstd' not available")
     def test_zstd(self):
         zstd = get_format("zstd")
         self._test_format(zstd)
-        assert zstd.default_ext == "zst"
-        self.assertEqual(
-            zstd.get_command("c", compresslevel=5),
-            [str(zstd_path), "-5", "-c", "--single-thread"],
-        )
-        self.assertEqual(
-            zstd.get_command("c", "foo.bar", compresslevel=5),
-            [str(zstd_path), "-5", "-c", "--single-thread", "foo.bar"],
-        )
-        self.assertEqual(
-            zstd.get_command("d"), [str(zstd_path), "-d", "-c", "--single-thread"]
-        )
-        self.assertEqual(
-            zstd.get_command("d", "foo.xz"),
-            [str(zstd_path), "-d", "-c", "--single-thread", "foo.xz"],
+        self.assertEqual(zstd.default_ext, "zst")
+        self._test_commands(
+            zstd,
+            zstd_path,
+            [
+                (("c",), dict(compresslevel=5), ["-5", "-c", "--single-thread"]),
+                (
+                    ("c", "foo.bar"),
+                    dict(compresslevel=5),
+                    ["-5", "-c", "--single-thread", "foo.bar"],
+                ),
+                (("d",), {}, ["-d", "-c", "--single-thread"]),
+                (("d", "foo.xz"), {}, ["-d", "-c", "--single-thread", "foo.xz"]),
+            ],
         )
         # Test with threads
         THREADS.update(3)
-        self.assertEqual(
-            zstd.get_command("c", compresslevel=5), [str(zstd_path), "-5", "-c", "-T2"]
+        self._test_commands(
+            zstd,
+            zstd_path,
+            [
+                (("c",), dict(compresslevel=5), ["-5", "-c", "-T2"]),
+                (
+                    ("c", "foo.bar"),
+                    dict(compresslevel=5),
+                    ["-5", "-c", "-T2", "foo.bar"],
+                ),
+                (("d",), {}, ["-d", "-c", "-T2"]),
+                # per-call threads override
+                (("d",), dict(threads=5), ["-d", "-c", "-T4"]),
+                (("d",), dict(threads=False), ["-d", "-c", "--single-thread"]),
+            ],
         )
-        self.assertEqual(
-            zstd.get_command("c", "foo.bar", compresslevel=5),
-            [str(zstd_path), "-5", "-c", "-T2", "foo.bar"],
-        )
-        self.assertEqual(zstd.get_command("d"), [str(zstd_path), "-d", "-c", "-T2"])
 
 
 class FileTests(TestCase):
@@ -310,31 +392,52 @@ class FileTests(TestCase):
 
     def tearDown(self):
         self.root.close()
+        THREADS.update(1)
 
     def test_invalid(self):
         with self.assertRaises(ValueError):
             get_format("gz").open_file(Path("foo"), "n")
 
-    def write_read_file(self, ext, use_system, mode="t", content=None):
+    def write_read_file(self, ext, use_system, mode="t", content=None, in_memory=False):
         if content is None:
-            content = random_text()  # generate 1 kb of random text
-            if mode == "b":
-                content = b"".join(c.encode() for c in content)
-        path = self.root.make_file(suffix=ext)
+            content = _CORPUS_BYTES if mode == "b" else _CORPUS_TEXT
         fmt = get_format(ext)
-        write_file(fmt, path, use_system, content, "w" + mode)
-        in_text = read_file(fmt, path, use_system, "r" + mode)
-        assert content == in_text
+        if in_memory:
+            # the python libraries can work on in-memory buffers
+            buf = BytesIO()
+            write_file(fmt, buf, use_system, content, "w" + mode)
+            buf.seek(0)
+            in_text = read_file(fmt, buf, use_system, "r" + mode)
+        else:
+            path = self.root.make_file(suffix=ext)
+            write_file(fmt, path, use_system, content, "w" + mode)
+            in_text = read_file(fmt, path, use_system, "r" + mode)
+        self.assertEqual(content, in_text)
 
     def test_write_read_bytes_python(self):
         for fmt in (".gz", ".bz2", ".xz"):
-            with self.subTest(fmt=fmt):
-                self.write_read_file(fmt, False, "b")
+            for in_memory in (False, True):
+                with self.subTest(fmt=fmt, in_memory=in_memory):
+                    self.write_read_file(fmt, False, "b", in_memory=in_memory)
 
     def test_write_read_text_python(self):
         for fmt in (".gz", ".bz2", ".xz"):
-            with self.subTest(fmt=fmt):
-                self.write_read_file(fmt, False, "t")
+            for in_memory in (False, True):
+                with self.subTest(fmt=fmt, in_memory=in_memory):
+                    self.write_read_file(fmt, False, "t", in_memory=in_memory)
+
+    @skipIf(no_zstandard, "'zstandard' not available")
+    def test_write_read_zstd_python(self):
+        for threads in (1, 2):
+            with self.subTest(threads=threads):
+                content = random_text()
+                path = self.root.make_file(suffix=".zst")
+                fmt = get_format(".zst")
+                with fmt.open_file(
+                    path, mode="wt", use_system=False, threads=threads
+                ) as f:
+                    f.write(content)
+                self.assertEqual(content, read_file(fmt, path, False))
 
     # These tests will be skipped if the required system-level executables
     # are not available
@@ -368,6 +471,37 @@ class FileTests(TestCase):
     def test_system_zstd(self):
         self.write_read_file(".zst", True)
 
+    def test_open_file_python_without_threads(self):
+        # formats written before open_file_python took a threads argument
+        class LegacyGzip(type(get_format(".gz"))):
+            def open_file_python(self, path_or_file, mode, **kwargs):
+                return gzip.open(path_or_file, str(mode), **kwargs)
+
+        fmt = LegacyGzip()
+        path = self.root.make_file(suffix=".gz")
+        write_file(fmt, path, False, _CORPUS_TEXT)
+        self.assertEqual(_CORPUS_TEXT, read_file(fmt, path, False))
+        source = self.root.make_file(contents=_CORPUS_TEXT)
+        dest = fmt.compress_file(source, use_system=False)
+        with gzip.open(dest, "rt") as i:
+            self.assertEqual(_CORPUS_TEXT, i.read())
+
+    def test_compress_path_pipelined(self):
+        content = random_text(100000)
+        path = self.root.make_file(contents=content)
+        fmt = get_format(".gz")
+        # the per-call value decides, whatever the global value is
+        for global_threads, threads, pipelined in ((1, 2, True), (8, 1, False)):
+            with self.subTest(threads=threads):
+                THREADS.update(global_threads)
+                with patch(
+                    "xphyle.formats.copy_file_chunked", wraps=copy_file_chunked
+                ) as copy:
+                    dest = fmt.compress_file(path, use_system=False, threads=threads)
+                self.assertIs(copy.call_args[1]["pipelined"], pipelined)
+                with gzip.open(dest, "rt") as i:
+                    self.assertEqual(i.read(), content)
+
     def test_compress_path(self):
         b = (True, False) if gz_path else (False,)
         for use_system in b:
@@ -378,11 +512,11 @@ class FileTests(TestCase):
                 fmt = get_format(".gz")
                 dest = fmt.compress_file(path, use_system=use_system)
                 gzfile = Path(str(path) + ".gz")
-                assert dest == gzfile
+                self.assertEqual(dest, gzfile)
                 self.assertTrue(os.path.exists(path))
                 self.assertTrue(os.path.exists(gzfile))
                 with gzip.open(gzfile, "rt") as i:
-                    assert i.read() == "foo"
+                    self.assertEqual(i.read(), "foo")
 
                 path = self.root.make_file()
                 with open(path, "wt") as o:
@@ -392,11 +526,11 @@ class FileTests(TestCase):
                 dest = fmt.compress_file(
                     path, gzfile, keep=False, use_system=use_system
                 )
-                assert dest == gzfile
+                self.assertEqual(dest, gzfile)
                 self.assertFalse(os.path.exists(path))
                 self.assertTrue(os.path.exists(gzfile))
                 with gzip.open(gzfile, "rt") as i:
-                    assert i.read() == "foo"
+                    self.assertEqual(i.read(), "foo")
 
     def test_compress_file(self):
         b = (True, False) if gz_path else (False,)
@@ -409,10 +543,10 @@ class FileTests(TestCase):
                     fmt = get_format(".gz")
                     dest = fmt.compress_file(i, use_system=use_system)
                 gzfile = Path(str(path) + ".gz")
-                assert dest == gzfile
+                self.assertEqual(dest, gzfile)
                 self.assertTrue(os.path.exists(gzfile))
                 with gzip.open(gzfile, "rt") as i:
-                    assert i.read() == "foo"
+                    self.assertEqual(i.read(), "foo")
 
                 path = self.root.make_file()
                 with open(path, "wt") as o:
@@ -423,11 +557,11 @@ class FileTests(TestCase):
                     dest = fmt.compress_file(
                         i, gzfile, keep=False, use_system=use_system
                     )
-                assert dest == gzfile
+                self.assertEqual(dest, gzfile)
                 self.assertFalse(os.path.exists(path))
                 self.assertTrue(os.path.exists(gzfile))
                 with gzip.open(gzfile, "rt") as i:
-                    assert i.read() == "foo"
+                    self.assertEqual(i.read(), "foo")
 
     def test_decompress_path_error(self):
         path = self.root.make_file()
@@ -438,54 +572,52 @@ class FileTests(TestCase):
             fmt.decompress_file(path)
 
     def test_decompress_path(self):
+        payload = gzip.compress(b"foo")
         b = (True, False) if gz_path else (False,)
         for use_system in b:
             with self.subTest(use_system=use_system):
                 path = self.root.make_file()
                 gzfile = Path(str(path) + ".gz")
-                with gzip.open(gzfile, "wt") as o:
-                    o.write("foo")
+                gzfile.write_bytes(payload)
                 fmt = get_format(".gz")
                 dest = fmt.decompress_file(gzfile, use_system=use_system)
-                assert dest == path
+                self.assertEqual(dest, path)
                 self.assertTrue(os.path.exists(path))
                 self.assertTrue(os.path.exists(gzfile))
                 with open(path, "rt") as i:
-                    assert i.read() == "foo"
+                    self.assertEqual(i.read(), "foo")
 
                 path = self.root.make_file()
                 gzfile = Path(str(path) + ".gz")
-                with gzip.open(gzfile, "wt") as o:
-                    o.write("foo")
+                gzfile.write_bytes(payload)
                 fmt = get_format(".gz")
                 dest = fmt.decompress_file(
                     gzfile, path, keep=False, use_system=use_system
                 )
-                assert dest == path
+                self.assertEqual(dest, path)
                 self.assertTrue(os.path.exists(path))
                 self.assertFalse(os.path.exists(gzfile))
                 with open(path, "rt") as i:
-                    assert i.read() == "foo"
+                    self.assertEqual(i.read(), "foo")
 
     def test_decompress_file(self):
+        payload = gzip.compress(b"foo")
         b = (True, False) if gz_path else (False,)
         for use_system in b:
             with self.subTest(use_system=use_system):
                 path = self.root.make_file()
                 gzfile = Path(str(path) + ".gz")
-                with gzip.open(gzfile, "wt") as o:
-                    o.write("foo")
+                gzfile.write_bytes(payload)
                 with open(gzfile, "rb") as i:
                     fmt = get_format(".gz")
                     dest = fmt.decompress_file(i, use_system=use_system)
-                assert Path(dest) == path
+                self.assertEqual(Path(dest), path)
                 self.assertTrue(os.path.exists(path))
                 self.assertTrue(os.path.exists(gzfile))
                 with open(path, "rt") as i:
-                    assert i.read() == "foo"
+                    self.assertEqual(i.read(), "foo")
 
-                with gzip.open(gzfile, "wt") as o:
-                    o.write("foo")
+                # gzfile was kept, so it can be decompressed again
                 dest = self.root.make_file()
                 with open(gzfile, "rb") as i, open(dest, "wb") as o:
                     fmt = get_format(".gz")
@@ -493,22 +625,21 @@ class FileTests(TestCase):
                 self.assertTrue(os.path.exists(dest))
                 self.assertTrue(os.path.exists(gzfile))
                 with open(dest, "rt") as i:
-                    assert i.read() == "foo"
+                    self.assertEqual(i.read(), "foo")
 
                 path = self.root.make_file()
                 gzfile = Path(str(path) + ".bar")
-                with gzip.open(gzfile, "wt") as o:
-                    o.write("foo")
+                gzfile.write_bytes(payload)
                 with open(gzfile, "rb") as i:
                     fmt = get_format(".gz")
                     dest = fmt.decompress_file(
                         i, path, keep=False, use_system=use_system
                     )
-                assert dest == path
+                self.assertEqual(dest, path)
                 self.assertFalse(os.path.exists(gzfile))
                 self.assertTrue(os.path.exists(path))
                 with open(path, "rt") as i:
-                    assert i.read() == "foo"
+                    self.assertEqual(i.read(), "foo")
 
     # Disable this test in python 3.3
     @skipIf(sys.version_info[:2] <= (3, 3), "Incompatible test")
@@ -528,19 +659,32 @@ class StringTests(TestCase):
         for ext in (".gz", ".bz2", ".xz"):
             with self.subTest(ext=ext):
                 fmt = get_format(ext)
-                _bytes = random_text().encode()
+                _bytes = _CORPUS_BYTES
                 compressed = fmt.compress(_bytes)
                 decompressed = fmt.decompress(compressed)
-                assert _bytes == decompressed
+                self.assertEqual(_bytes, decompressed)
+
+    def test_gzip_compat(self):
+        # the in-memory gzip implementation may differ from the gzip module
+        fmt = get_format(".gz")
+        compressed = fmt.compress(_CORPUS_BYTES, compresslevel=9)
+        self.assertEqual(_CORPUS_BYTES, gzip.decompress(compressed))
+        # the requested level is honored, not lowered to what isal supports
+        self.assertEqual(
+            len(gzip.compress(_CORPUS_BYTES, compresslevel=9)), len(compressed)
+        )
+        compressed = fmt.compress(_CORPUS_BYTES, compresslevel=1)
+        self.assertEqual(_CORPUS_BYTES, gzip.decompress(compressed))
+        self.assertEqual(_CORPUS_BYTES, fmt.decompress(gzip.compress(_CORPUS_BYTES)))
 
     def test_compress_string(self):
         for ext in (".gz", ".bz2", ".xz"):
             with self.subTest(ext=ext):
                 fmt = get_format(ext)
-                text = random_text()
+                text = _CORPUS_TEXT
                 compressed = fmt.compress_string(text)
                 decompressed = fmt.decompress_string(compressed)
-                assert text == decompressed
+                self.assertEqual(text, decompressed)
 
     def test_compress_iterable(self):
         for ext in (".gz", ".bz2", ".xz"):
@@ -555,11 +699,11 @@ class StringTests(TestCase):
 class UncompressedSizeTests(TestCase):
     @skipIf(gz_path is None, "'gzip' not available")
     def test_get_uncompressed_size(self):
-        for ext in (".gz", ".xz"):
-            with self.subTest(ext=ext):
-                with TempDir() as temp:
-                    raw = temp.make_file(contents=random_text(1000))
+        with TempDir() as temp:
+            raw = temp.make_file(contents=random_text(1000))
+            for ext in (".gz", ".xz"):
+                with self.subTest(ext=ext):
                     compressed = temp.make_file(suffix=ext)
                     fmt = get_format(ext)
                     fmt.compress_file(raw, compressed)
-                    assert 1000 == fmt.uncompressed_size(compressed)
+                    self.assertEqual(1000, fmt.uncompressed_size(compressed))
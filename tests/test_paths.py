@@ -1,5 +1,7 @@
 from unittest import TestCase
-import subprocess
+import gc
+import threading
+import weakref
 from xphyle.paths import *
 
 
@@ -29,6 +31,27 @@ class TempDirTests(TestCase):
             assert Path('foo') == desc.relative_path
             assert temp.absolute_path / 'foo' == desc.absolute_path
 
+    def test_make_unnamed_files(self):
+        fd_dir = Path('/proc/self/fd')
+        with TempDir() as temp:
+            num_fds = len(os.listdir(fd_dir)) if fd_dir.exists() else None
+            paths = temp.make_empty_files(3, suffix='.txt')
+            f = temp.make_file(contents='foo', permissions='r')
+            if num_fds is not None:
+                assert num_fds == len(os.listdir(fd_dir))
+            assert 3 == len(paths)
+            assert all(p.suffix == '.txt' and p.exists() for p in paths)
+            with open(f, 'rt') as i:
+                assert 'foo' == i.read()
+            assert PermissionSet('r') == get_permissions(f)
+
+    def test_make_named_file(self):
+        with TempDir() as temp:
+            f = temp.make_file(name='foo', contents='foo', permissions='r')
+            with open(f, 'rt') as i:
+                assert 'foo' == i.read()
+            assert PermissionSet('r') == get_permissions(f)
+
     def test_context_manager(self):
         with TempDir() as temp:
             with open(temp.make_file(name='foo'), 'wt') as o:
@@ -47,6 +70,18 @@ class TempDirTests(TestCase):
         # make sure trying to close again doesn't raise error
         temp.close()
 
+    def test_unreferenced(self):
+        temp = TempDir()
+        foo = temp.make_directory(name='foo')
+        temp.make_file(name='bar', parent=foo)
+        temp[foo].set_permissions('r')
+        ref = weakref.ref(temp)
+        path = temp.absolute_path
+        del temp
+        gc.collect()
+        assert ref() is None
+        assert not path.exists()
+
     def test_tree(self):
         temp = TempDir()
         foo = temp.make_directory(name='foo')
@@ -77,10 +112,18 @@ class TempDirTests(TestCase):
             with self.assertRaises(Exception):
                 _ = temp.make_fifo(contents='foo')
             path = temp.make_fifo()
-            p = subprocess.Popen('echo foo > {}'.format(path), shell=True)
+
+            def write_fifo():
+                with open(path, 'wt') as o:
+                    o.write('foo\n')
+
+            # opening a FIFO blocks until the other end is opened, so write
+            # from a thread
+            writer = threading.Thread(target=write_fifo)
+            writer.start()
             with open(path, 'rt') as i:
                 assert i.read() == 'foo\n'
-            p.communicate()
+            writer.join()
 
 
 class PathTests(TestCase):
@@ -91,6 +134,19 @@ class PathTests(TestCase):
         self.root.close()
         EXECUTABLE_CACHE.cache.clear()
 
+    def test_deprecated_str_to_path(self):
+        @deprecated_str_to_path(0, list_args=(1,), dict_args=("d",))
+        def f(p, lst, d=None):
+            return p, lst, d
+
+        with self.assertWarns(DeprecationWarning):
+            assert (Path('a'), [Path('b')], None) == f('a', [Path('b')])
+        with self.assertWarns(DeprecationWarning):
+            assert (Path('a'), [Path('b')], None) == f(Path('a'), ['b'])
+        with self.assertWarns(DeprecationWarning):
+            assert (Path('a'), [], dict(x=Path('c'))) == f(
+                Path('a'), [], d=dict(x='c'))
+
     def test_get_set_permissions(self):
         path = self.root.make_file(permissions='rw')
         assert PermissionSet('rw') == get_permissions(path)
@@ -296,7 +352,8 @@ class PathTests(TestCase):
         exe_name = exe.name
         path = EXECUTABLE_CACHE.resolve_exe([exe_name])
         assert path is None
-        EXECUTABLE_CACHE.cache.clear()
+        # the miss is cached until the search path changes
+        assert exe_name in EXECUTABLE_CACHE.cache
         EXECUTABLE_CACHE.add_search_path(exe.parent)
         path = EXECUTABLE_CACHE.resolve_exe([exe_name])
         assert path is not None
@@ -1,8 +1,10 @@
 from unittest import TestCase
 from . import *
+import io
 import xphyle
 from xphyle.paths import TempDir
-from xphyle.progress import ITERABLE_PROGRESS, PROCESS_PROGRESS
+from xphyle.progress import (
+    ITERABLE_PROGRESS, PROCESS_PROGRESS, copy_file_chunked)
 from xphyle.utils import *
 
 
@@ -37,8 +39,52 @@ class ProgressTests(TestCase):
                 o.write(random_text())
         compress_file(
             path, compression='gz', use_system=False)
+        # the 100 KiB file is read in a single (1 MiB) chunk
+        assert 1 == progress.count
+
+    def test_copy_progress(self):
+        progress = MockProgress()
+        xphyle.configure(progress=True, progress_wrapper=progress)
+        data = random_text(10000).encode()
+        dest = io.BytesIO()
+        copy_file_chunked(io.BytesIO(data), dest, chunksize=100)
+        assert data == dest.getvalue()
         assert 100 == progress.count
     
+    def test_copy_pipelined(self):
+        data = random_text(10000).encode()
+        source = io.BytesIO(data)
+        dest = io.BytesIO()
+        copy_file_chunked(source, dest, chunksize=100, pipelined=True)
+        assert data == dest.getvalue()
+
+    def test_copy_file(self):
+        # regular files are advised to be read sequentially
+        data = random_text(10000).encode()
+        path = self.root.make_file()
+        path.write_bytes(data)
+        dest = io.BytesIO()
+        with open(path, 'rb') as source:
+            copy_file_chunked(source, dest, chunksize=100)
+        assert data == dest.getvalue()
+
+    def test_copy_pipelined_errors(self):
+        class BadReader(io.BytesIO):
+            def read(self, size=-1):
+                raise IOError('read failed')
+
+        class BadWriter(io.BytesIO):
+            def write(self, data):
+                raise IOError('write failed')
+
+        with self.assertRaisesRegex(IOError, 'read failed'):
+            copy_file_chunked(
+                BadReader(), io.BytesIO(), chunksize=10, pipelined=True)
+        with self.assertRaisesRegex(IOError, 'write failed'):
+            copy_file_chunked(
+                io.BytesIO(random_text(10000).encode()), BadWriter(),
+                chunksize=10, pipelined=True)
+
     def test_progress_delmited(self):
         progress = MockProgress()
         xphyle.configure(progress=True, progress_wrapper=progress)
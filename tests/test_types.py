@@ -63,8 +63,10 @@ class TypeTests(TestCase):
 
         a = PermissionSet()
         a.add(ModeAccess.READ)
+        self.assertEqual(stat.S_IREAD, a.stat_flags)
         a.add(ModeAccess.WRITE)
         self.assertEqual("rw", str(a))
+        self.assertEqual(stat.S_IREAD | stat.S_IWRITE, a.stat_flags)
 
     def test_cache(self):
         fm1 = FileMode("rt")
@@ -1,6 +1,9 @@
-from unittest import TestCase
+from unittest import TestCase, skipIf
 from . import *
+import errno
 import gzip
+import io
+import importlib.util
 import bz2
 from xphyle.formats import THREADS
 from xphyle.paths import TempDir, EXECUTABLE_CACHE
@@ -35,6 +38,12 @@ class UtilsTests(TestCase):
         self.assertListEqual(
             list(read_lines(path, convert=int)),
             [1, 2, 3])
+        self.assertListEqual(
+            list(read_lines(path, convert=str.split, strip_linesep=False)),
+            [['1'], ['2'], ['3']])
+        self.assertListEqual(
+            list(read_lines(path, strip_linesep=False)),
+            ['1\n', '2\n', '3'])
 
     def test_read_chunked(self):
         self.assertListEqual([], list(read_bytes(Path('foobar'), errors=False)))
@@ -43,6 +52,16 @@ class UtilsTests(TestCase):
             o.write("1234567890")
         chunks = list(read_bytes(path, 3))
         self.assertListEqual([b'123', b'456', b'789', b'0'], chunks)
+        gzpath = self.root.make_file(suffix='.gz')
+        with gzip.open(gzpath, 'wt') as o:
+            o.write("1234567890")
+        for use_system in (True, False):
+            with self.subTest(use_system=use_system):
+                chunks = list(read_bytes(gzpath, 3, use_system=use_system))
+                self.assertListEqual([b'123', b'456', b'789', b'0'], chunks)
+        with intercept_stdin(b'1234', is_bytes=True):
+            self.assertListEqual(
+                [b'123', b'4'], list(read_bytes(STDIN, 3, compression=False)))
 
     def test_write_lines(self):
         linesep_len = len(os.linesep)
@@ -63,6 +82,12 @@ class UtilsTests(TestCase):
         path = self.root.make_file(permissions='r')
         assert -1 == write_lines(['foo'], path, errors=False)
 
+    def test_write_lines_batched(self):
+        path = self.root.make_file()
+        lines = [''] + [str(i) for i in range(2500)]
+        assert len('\n'.join(lines)) == write_lines(lines, path)
+        assert list(read_lines(path)) == lines
+
     def test_write_bytes(self):
         path = self.root.make_file()
         linesep_len = len(os.linesep)
@@ -88,11 +113,25 @@ class UtilsTests(TestCase):
         assert d['foo'] == 1
         assert d['bar'] == 2
         assert list(d.items()) == [('foo', 1), ('bar', 2)]
+        with open(path, 'wt') as o:
+            o.write("  # indented comment\n")
+            o.write("\n")
+            o.write("foo=a=b\n")
+        assert dict(foo='a=b') == read_dict(path)
+        with open(path, 'wt') as o:
+            o.write("foo=1\n")
+            o.write("bar\n")
+        with self.assertRaisesRegex(ValueError, "'bar'"):
+            read_dict(path)
 
     def test_write_dict(self):
         path = self.root.make_file()
         write_dict(OrderedDict([('foo', 1), ('bar', 2)]), path, linesep=None)
         assert list(read_lines(path)) == ['foo=1', 'bar=2']
+        path = self.root.make_file()
+        assert 11 == write_dict(dict(foo=1, bar=2), path, sep=':', linesep='|')
+        with open(path, 'rt') as i:
+            assert 'foo:1|bar:2' == i.read()
 
     def test_tsv(self):
         assert [] == list(read_delimited(Path('foobar'), errors=False))
@@ -128,6 +167,12 @@ class UtilsTests(TestCase):
             (4, 5, 6)
         ] == list(read_delimited(
             path, header=True, converters=int, row_type=tuple))
+        assert [
+            ['a', 'b', 'c'],
+            [1, '2', 3],
+            [4, '5', 6]
+        ] == list(read_delimited(
+            path, header=True, converters=(fn for fn in (int, None, int))))
         assert [
             dict(a=1, b=2, c=3),
             dict(a=4, b=5, c=6)
@@ -170,6 +215,41 @@ class UtilsTests(TestCase):
             path, key=lambda row: 'row{}'.format(row[0]),
             header=True, converters=int)
 
+    @skipIf(importlib.util.find_spec('pandas') is None, "'pandas' not available")
+    def test_tsv_dict_pandas(self):
+        path = self.root.make_file()
+        with open(path, 'wt') as o:
+            o.write('id\ta\tb\tc\n')
+            o.write('row1\t1\t2\t3\n')
+            o.write('row2\t4\t5\t6\n')
+
+        with self.assertRaises(ValueError):
+            read_delimited_as_dict(path, key=len, header=True, engine='pandas')
+        with self.assertRaises(ValueError):
+            read_delimited_as_dict(path, header=True, engine='foo')
+
+        assert dict(
+            row1=('row1', 1, 2, 3),
+            row2=('row2', 4, 5, 6)
+        ) == read_delimited_as_dict(path, key='id', header=True, engine='pandas')
+        rows = read_delimited_as_dict(path, key=0, header=True, engine='pandas')
+        assert dict(
+            row1=('row1', 1, 2, 3),
+            row2=('row2', 4, 5, 6)
+        ) == rows
+        # values are python objects, as with the python engine
+        assert [str, int, int, int] == [type(v) for v in rows['row1']]
+        assert {
+            1: ('row1', 1),
+            4: ('row2', 4)
+        } == read_delimited_as_dict(
+            path, key='a', header=True, engine='pandas', usecols=['id', 'a'])
+
+        with open(path, 'at') as o:
+            o.write('row1\t7\t8\t9\n')
+        with self.assertRaises(ValueError):
+            read_delimited_as_dict(path, key='id', header=True, engine='pandas')
+
     def test_tsv_dict_dups(self):
         path = self.root.make_file()
         with open(path, 'wt') as o:
@@ -177,7 +257,7 @@ class UtilsTests(TestCase):
             o.write('row1\t1\t2\t3\n')
             o.write('row1\t4\t5\t6\n')
 
-        with self.assertRaises(Exception):
+        with self.assertRaises(ValueError):
             read_delimited_as_dict(
                 path, key='id', header=True, converters=(str, int, int, int))
 
@@ -280,6 +360,58 @@ class UtilsTests(TestCase):
         with bz2.open(bzfile, 'rt') as i:
             assert 'foo' == i.read()
 
+    def test_transcode_uncompressed(self):
+        content = random_text(10000)
+        path = self.root.make_file(contents=content)
+        dest = self.root.make_file()
+        transcode_file(
+            path, dest, source_compression=False, dest_compression=False)
+        with open(dest, 'rt') as i:
+            assert content == i.read()
+        # partially-read source file object
+        dest = self.root.make_file()
+        with open(path, 'rb') as src:
+            src.read(100)
+            transcode_file(
+                src, dest, source_compression=False, dest_compression=False)
+        with open(dest, 'rt') as i:
+            assert content[100:] == i.read()
+        # non-file source
+        dest = self.root.make_file()
+        transcode_file(
+            io.BytesIO(content.encode()), dest, source_compression=False,
+            dest_compression=False)
+        with open(dest, 'rt') as i:
+            assert content == i.read()
+
+    @skipIf(not hasattr(os, 'sendfile'), "os.sendfile not available")
+    def test_transcode_sendfile_errors(self):
+        content = random_text(10000)
+        path = self.root.make_file(contents=content)
+        # sendfile not supported for these files: fall back to a regular copy
+        dest = self.root.make_file()
+        with patch('os.sendfile', side_effect=OSError(errno.EINVAL, 'no')):
+            transcode_file(
+                path, dest, source_compression=False, dest_compression=False)
+        with open(dest, 'rt') as i:
+            assert content == i.read()
+        # failure after part of the file has been copied
+        sendfile = os.sendfile
+        calls = []
+
+        def failing_sendfile(out_fd, in_fd, offset, count):
+            calls.append(offset)
+            if len(calls) > 1:
+                raise OSError(errno.ENOSPC, 'No space left on device')
+            return sendfile(out_fd, in_fd, offset, 100)
+
+        dest = self.root.make_file()
+        with patch('os.sendfile', side_effect=failing_sendfile):
+            with self.assertRaises(OSError):
+                transcode_file(
+                    path, dest, source_compression=False,
+                    dest_compression=False)
+
     def test_uncompressed_size(self):
         for ext in ('.gz', '.xz'):
             with self.subTest(ext):
@@ -310,11 +442,40 @@ class UtilsTests(TestCase):
         with self.assertRaises(ValueError):
             linecount(path, mode='wb')
         assert 100 == linecount(path)
+        assert 100 == linecount(path, buffer_size=7)
+
+    def test_linecount_compressed(self):
+        path = self.root.make_file(suffix='.gz')
+        with gzip.open(path, 'wt') as o:
+            o.write('\n'.join(random_text() for _ in range(10)))
+        for use_system in (True, False):
+            with self.subTest(use_system=use_system):
+                assert 10 == linecount(path, use_system=use_system)
 
     def test_linecount_empty(self):
         path = self.root.make_file()
         assert 0 == linecount(path)
 
+    def test_linecount_read_only(self):
+        class ReadOnly:
+            """A file-like object that only implements read()."""
+            mode = 'rb'
+            closed = False
+
+            def __init__(self, data):
+                self._buffer = BytesIO(data)
+
+            def read(self, size=-1):
+                return self._buffer.read(size)
+
+            def close(self):
+                pass
+
+        fileobj = ReadOnly(b'foo\nbar\nbaz')
+        assert 3 == linecount(
+            fileobj, linesep=b'\n', buffer_size=2, compression=False,
+            validate=False)
+
     def test_file_manager(self):
         paths12 = dict(
             path1=self.root.make_empty_files(1)[0],
@@ -346,6 +507,22 @@ class UtilsTests(TestCase):
         for key, fh in f.iter_files():
             self.assertTrue(fh.closed)
 
+    def test_file_manager_close_error(self):
+        class BadFile(io.StringIO):
+            name = 'bad'
+
+            def close(self):
+                super().close()
+                raise IOError('close failed')
+
+        path1 = self.root.make_file()
+        path2 = self.root.make_file()
+        f = FileManager([path1, ('bad', BadFile()), path2], mode='wt')
+        files = [fh for key, fh in f.iter_files()]
+        with self.assertRaises(IOError):
+            f.close()
+        self.assertTrue(all(fh.closed for fh in files))
+
     def test_file_manager_dup_files(self):
         f = FileManager()
         path = self.root.make_file()
@@ -1,6 +1,7 @@
 from unittest import TestCase, skipIf
 from . import *
 import gzip
+import subprocess
 from io import BytesIO, IOBase
 from xphyle import *
 from xphyle.paths import TempDir, STDIN, STDOUT, STDERR, EXECUTABLE_CACHE
@@ -96,6 +97,14 @@ class XphyleTests(TestCase):
         with open_(cast(IOBase, None), mode="r", errors=False) as fh:
             self.assertIsNone(fh)
 
+    def test_open_safe_body_error(self):
+        path = self.root.make_file(contents="foo")
+        with self.assertRaises(IOError):
+            with open_(path, errors=False) as i:
+                assert i is not None
+                raise IOError("error while reading")
+        self.assertTrue(i.closed)
+
     def test_xopen_invalid(self):
         # invalid mode
         with self.assertRaises(ValueError):
@@ -211,6 +220,23 @@ class XphyleTests(TestCase):
             with xopen(existing_file, "wt", overwrite=False):
                 pass
 
+    def test_xopen_threads(self):
+        fmt = FORMATS.get_compression_format("xz")
+        cmd = fmt.get_command("c", threads=3)
+        assert cmd[cmd.index("-T") + 1] == "3"
+        path = self.root.make_file(suffix=".xz")
+        with patch("xphyle.formats.Popen", wraps=subprocess.Popen) as popen:
+            with xopen(path, "wt", compression=True, threads=2) as o:
+                o.write("foo")
+        if fmt.can_use_system_compression:
+            args = popen.call_args[0][0]
+            assert args[args.index("-T") + 1] == "2"
+        # the per-call value must not change the global one
+        assert THREADS.threads == 1
+        with xopen(path, "rt", compression=True, threads=2) as i:
+            assert i.read() == "foo"
+        assert THREADS.threads == 1
+
     def test_xopen_fileobj(self):
         path = self.root.make_file(suffix=".gz")
         with open(path, "wb") as out1:
@@ -327,6 +353,27 @@ class XphyleTests(TestCase):
             i.seek(1)
             assert b"o" == i.peek(1)
 
+    def test_direct_methods(self):
+        path = self.root.make_file()
+        with open_(path, "wb") as o:
+            assert o.write == o._fileobj.write
+            o.write(b"foo")
+        with open_(path, "rb") as i:
+            buf = bytearray(2)
+            assert 2 == i.readinto(buf)
+            assert b"fo" == buf
+            assert b"o" == i.read()
+
+        class UpperWrapper(FileWrapper):
+            def write(self, string):
+                return super().write(string.upper())
+
+        path = self.root.make_file()
+        with UpperWrapper(path, "wt") as o:
+            o.write("foo")
+        with open(path, "rt") as i:
+            assert "FOO" == i.read()
+
     def test_truncate(self):
         path = self.root.make_file(contents="foo")
         with open_(path, "r+") as i:
@@ -446,9 +493,12 @@ class XphyleTests(TestCase):
     def test_process_close_hung(self):
         p = Process(("sleep", "5"))
         with self.assertRaises(Exception):
-            p.close1(timeout=1, terminate=False)
+            p.close1(timeout=0.1, terminate=False)
+        # Don't leave the hung process for __del__, which waits up to 1s
+        p.close1(timeout=0.1, terminate=True)
+        self.assertTrue(p.closed)
         p = Process(("sleep", "5"))
-        p.close1(timeout=1, terminate=True)
+        p.close1(timeout=0.1, terminate=True)
         self.assertTrue(p.closed)
 
     def test_process_error(self):
@@ -146,6 +146,12 @@ class EventManager:
                 listener(self, **kwargs)
 
 
+_DIRECT_METHODS = ("read", "readinto", "readline", "write")
+"""Pass-through methods of :class:`FileLikeWrapper` that are replaced by the
+wrapped file's bound methods.
+"""
+
+
 class FileLikeWrapper(EventManager, FileLikeBase):
     """Base class for wrappers around file-like objects. By default, method
     calls are forwarded to the file object. Adds the following:
@@ -173,6 +179,15 @@ class FileLikeWrapper(EventManager, FileLikeBase):
         self._iterator: Optional[Iterator] = None
         self.compression = compression
         self.close_fileobj = close_fileobj
+        # Bind the wrapped file's I/O methods directly to the instance (unless
+        # overridden by a subclass) to avoid an extra python-level call per
+        # read/write
+        cls = type(self)
+        for attr in _DIRECT_METHODS:
+            if getattr(cls, attr) is getattr(FileLikeWrapper, attr) and hasattr(
+                fileobj, attr
+            ):
+                setattr(self, attr, getattr(fileobj, attr))
 
     def __next__(self) -> bytes:
         return next(iter(self))
@@ -267,6 +282,13 @@ class FileLikeWrapper(EventManager, FileLikeBase):
     def read(self, size: int = -1) -> bytes:  # pragma: no-cover
         return self._fileobj.read(size)
 
+    def readinto(self, buffer: bytearray) -> int:  # pragma: no-cover
+        # Not every file-like object implements readinto; fall back to the
+        # read()-based implementation for those that don't
+        if not hasattr(self._fileobj, "readinto"):
+            return FileLikeBase.readinto(self, buffer)
+        return self._fileobj.readinto(buffer)
+
     def readline(self, size: int = -1) -> AnyChar:  # pragma: no-cover
         return self._fileobj.readline(size)
 
@@ -853,14 +875,19 @@ def open_(
                 )
         else:
             kwargs["context_wrapper"] = True
+            # Only errors from opening the file are handled; errors raised
+            # while the caller is using the file always propagate
             try:
-                with xopen(target, mode, **kwargs) as fileobj:
-                    yield fileobj
+                fileobj = xopen(target, mode, **kwargs)
             except IOError:
                 if errors:
                     raise
-                else:
-                    yield None
+                fileobj = None
+            if fileobj is None:
+                yield None
+            else:
+                with fileobj:
+                    yield fileobj
 
 
 def _maybe_mmap(
@@ -910,6 +937,7 @@ def xopen(
     memory_map: bool = False,
     mmap_max_length: int = DEFAULTS["mmap_max_length"],
     mmap_mode: Optional[dict] = None,
+    threads: Optional[Union[bool, int]] = None,
     **kwargs,
 ) -> FileLike:
     """
@@ -952,6 +980,12 @@ def xopen(
             regular file (i.e. it has a system `fileno`).
         mmap_max_length:
         mmap_mode:
+        threads: Number of threads to use when the file is compressed; passed
+            to the system executable when `use_system` is True, and to the
+            python library for formats whose library supports multi-threading
+            (e.g. zstd). Ignored by formats that do not support
+            multi-threading. True means use all available cores. If None, the
+            default value (set using :method:`configure`) is used.
         kwargs: Additional keyword arguments to pass to ``open``.
 
     `path` is interpreted as follows:
@@ -1278,7 +1312,7 @@ def xopen(
                 fileobj or target, mode.as_binary(), mmap_max_length, mmap_mode
             )
         fileobj = fmt.open_file(
-            fileobj or target, mode, use_system=use_system, **kwargs
+            fileobj or target, mode, use_system=use_system, threads=threads, **kwargs
         )
         is_std = False
     else:
@@ -5,6 +5,7 @@ Magic numbers from: https://en.wikipedia.org/wiki/List_of_file_signatures
 from abc import ABC, ABCMeta, abstractmethod
 from collections import defaultdict
 from importlib import import_module
+from importlib.util import find_spec
 import io
 from io import UnsupportedOperation
 import os
@@ -13,6 +14,8 @@ import re
 from subprocess import Popen, PIPE, CalledProcessError, check_output
 from typing import (
     Callable,
+    Dict,
+    FrozenSet,
     Iterable,
     Iterator,
     List,
@@ -35,7 +38,7 @@ from xphyle.paths import (
     split_path,
     deprecated_str_to_path,
 )
-from xphyle.progress import PROCESS_PROGRESS, iter_file_chunked
+from xphyle.progress import PROCESS_PROGRESS, copy_file_chunked
 from xphyle.types import (
     FileMode,
     FileLike,
@@ -64,16 +67,35 @@ class ThreadsVar:
         """
         if threads is None:
             self.threads = self.default_value
+        else:
+            self.threads = self.resolve(threads)
+
+    def resolve(self, threads: Optional[Union[bool, int]] = None) -> int:
+        """Resolve a per-call ``threads`` value to a number of threads, without
+        changing the current value.
+
+        Args:
+            threads: True = use all available cores; False or an int <= 1 means
+                single-threaded; None means use the current value; otherwise an
+                integer number of threads.
+
+        Returns:
+            The number of threads to use.
+        """
+        if threads is None:
+            return self.threads
         elif threads is False:
-            self.threads = 1
+            return 1
         elif threads is True:
             import multiprocessing
 
-            self.threads = multiprocessing.cpu_count()
+            # Use every core rather than reserving one: multi-threaded
+            # compressors (e.g. pigz) always have a thread blocked on I/O
+            return multiprocessing.cpu_count()
         elif threads < 1:
-            self.threads = 1
+            return 1
         else:
-            self.threads = threads  # pylint: disable=redefined-variable-type
+            return threads
 
 
 THREADS = ThreadsVar()
@@ -82,6 +104,24 @@ parallelization.
 """
 
 
+_ISAL_IGZIP: Optional[ModuleType] = (
+    import_module("isal.igzip") if find_spec("isal") is not None else None
+)
+ISAL_AVAILABLE = _ISAL_IGZIP is not None
+"""Whether python-isal is installed, in which case its ``igzip`` module is used
+in place of :module:`gzip` for in-memory gzip decompression, and for
+compression at levels up to `ISAL_MAX_COMPRESSLEVEL`.
+"""
+ISAL_MAX_COMPRESSLEVEL = 3
+"""The maximum compression level supported by python-isal."""
+
+PYTHON_BUFFER_SIZE = 128 * 1024
+"""Size of the buffer wrapped around binary files opened with a python-level
+compression library, which is large enough for reads and writes to pass
+sizeable chunks to the (de)compressor.
+"""
+
+
 # File formats
 # pylint: disable=no-member
 
@@ -483,6 +523,7 @@ class CompressionFormat(FileFormat):
         src: PurePath = STDIN,
         stdout: bool = True,
         compresslevel: int = None,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         """Build the command for the system executable.
 
@@ -492,6 +533,9 @@ class CompressionFormat(FileFormat):
                 stdin
             stdout: Whether output should go to stdout
             compresslevel: Integer compression level; typically 1-9
+            threads: Number of threads to use, for executables that support
+                multi-threading; see :method:`ThreadsVar.resolve`. If None, the
+                value set using :method:`xphyle.configure` is used.
 
         Returns:
             List of command arguments
@@ -522,7 +566,12 @@ class CompressionFormat(FileFormat):
 
     @deprecated_str_to_path(1, "path")
     def open_file(
-        self, path: PurePath, mode: ModeArg, use_system: bool = True, **kwargs
+        self,
+        path: PurePath,
+        mode: ModeArg,
+        use_system: bool = True,
+        threads: Optional[Union[bool, int]] = None,
+        **kwargs,
     ) -> FileLike:
         """Opens a compressed file for reading or writing.
 
@@ -534,6 +583,9 @@ class CompressionFormat(FileFormat):
             path: The path of the file to open.
             mode: The file open mode.
             use_system: Whether to attempt to use system-level compression.
+            threads: Number of threads to use, if system-level compression is
+                used and the executable supports multi-threading. If None, the
+                value set using :method:`xphyle.configure` is used.
             kwargs: Additional arguments to pass to the python-level open
                 method, if system-level compression isn't used.
 
@@ -550,7 +602,7 @@ class CompressionFormat(FileFormat):
                 compressed_file = SystemReader(
                     self.compress_path,
                     path,
-                    self.get_command("d", src=path),
+                    self.get_command("d", src=path, threads=threads),
                     self.compress_name,
                 )
             elif not mode.readable and self.can_use_system_decompression:
@@ -559,7 +611,7 @@ class CompressionFormat(FileFormat):
                     self.decompress_path,
                     path,
                     bin_mode,
-                    self.get_command("c"),
+                    self.get_command("c", threads=threads),
                     self.decompress_name,
                 )
             if compressed_file:
@@ -569,21 +621,32 @@ class CompressionFormat(FileFormat):
                 else:
                     return compressed_file
 
+        if threads is not None:
+            # only passed when set, so that formats whose open_file_python does
+            # not accept threads keep working
+            kwargs["threads"] = threads
         return self.open_file_python(path, mode, **kwargs)
 
     def open_file_python(
-        self, path_or_file: PathOrFile, mode: ModeArg, **kwargs
+        self,
+        path_or_file: PathOrFile,
+        mode: ModeArg,
+        threads: Optional[Union[bool, int]] = None,
+        **kwargs,
     ) -> FileLike:
         """Open a file using the python library.
 
         Args:
             path_or_file: The file to open -- a path or open file object.
             mode: The file open mode.
+            threads: Number of threads to use, if the python library supports
+                multi-threading; otherwise ignored.
             kwargs: Additional arguments to pass to the open method.
 
         Returns:
             A file-like object.
         """
+        # pylint: disable=unused-argument
         if isinstance(mode, str):
             mode = FileMode(mode)
         return self.lib.open(path_or_file, mode.value, **kwargs)
@@ -596,6 +659,7 @@ class CompressionFormat(FileFormat):
         keep: bool = True,
         compresslevel: int = None,
         use_system: bool = True,
+        threads: Optional[Union[bool, int]] = None,
         **kwargs,
     ) -> PurePath:
         """Compress data from one file and write to another.
@@ -607,6 +671,10 @@ class CompressionFormat(FileFormat):
             keep: Whether to keep the source file.
             compresslevel: Compression level.
             use_system: Whether to try to use system-level compression.
+            threads: Number of threads to use for compression; None means use
+                the value of ``THREADS``. With python-level compression, more
+                than one thread also overlaps reading the source with
+                compression.
             kwargs: Additional arguments to pass to the open method when opening
                 the destination file.
 
@@ -616,6 +684,7 @@ class CompressionFormat(FileFormat):
         Raises:
             IOError if there is an error compressing the file.
         """
+        num_threads = THREADS.resolve(threads)
         source_is_path = isinstance(source, PurePath)
         if source_is_path:
             source_path = source
@@ -653,7 +722,9 @@ class CompressionFormat(FileFormat):
                 else:
                     dest_file = cast(FileLike, dest)
                     dest_name = dest_file.name
-                cmd = self.get_command("c", src=cmd_src, compresslevel=compresslevel)
+                cmd = self.get_command(
+                    "c", src=cmd_src, compresslevel=compresslevel, threads=num_threads
+                )
                 proc = PROCESS_PROGRESS.wrap(
                     cmd, stdin=prc_src, stdout=dest_file, stderr=PIPE
                 )
@@ -665,12 +736,15 @@ class CompressionFormat(FileFormat):
                 else:
                     source_file = cast(FileLike, source)
                 dest_name = str(dest)
+                if threads is not None:
+                    # as in open_file, only passed when set
+                    kwargs["threads"] = threads
                 dest_file = self.open_file_python(dest, "wb", **kwargs)
                 try:
                     # Perform sequential compression as the source
-                    # file might be quite large
-                    for chunk in iter_file_chunked(source_file):
-                        dest_file.write(chunk)
+                    # file might be quite large; if multiple threads are
+                    # allowed, read the next chunks while compressing
+                    copy_file_chunked(source_file, dest_file, pipelined=num_threads > 1)
                 except EOFError as err:
                     raise IOError from err
                 finally:
@@ -760,8 +834,7 @@ class CompressionFormat(FileFormat):
                 try:
                     # Perform sequential decompression as the source
                     # file might be quite large
-                    for chunk in iter_file_chunked(source_file):
-                        dest_file.write(chunk)
+                    copy_file_chunked(source_file, dest_file)
                 except EOFError as err:
                     raise IOError from err
                 finally:
@@ -832,13 +905,18 @@ class Formats:
         self.compression_format_aliases = {}
         """Dict mapping aliases to compression format names."""
         self.magic_bytes = defaultdict(lambda: [])
-        """Dict mapping the first byte in a 'magic' sequence to a tuple of
-        (format, rest_of_sequence)
+        """Dict mapping the first byte in a 'magic' sequence to a list of
+        (format, sequence) tuples, where sequence is the complete magic bytes
+        object. Each list is kept sorted by decreasing sequence length.
         """
         self.max_magic_bytes = 0
         """Maximum number of bytes in a registered magic byte sequence"""
         self.mime_types = {}
         """Dict mapping MIME types to file formats"""
+        self._extensions: Dict[bool, FrozenSet[str]] = {}
+        """Cache of the extensions returned by `list_extensions`, keyed by
+        `with_sep`. Invalidated by `register_compression_format`.
+        """
 
     def register_compression_format(
         self, format_class: Callable[[], CompressionFormat]
@@ -850,6 +928,7 @@ class Formats:
         """
         fmt = format_class()
         self.compression_formats[fmt.name] = fmt
+        self._extensions.clear()
         for alias in fmt.aliases:
             # TODO: warn about overriding existing format?
             self.compression_format_aliases[alias] = fmt.name
@@ -857,7 +936,10 @@ class Formats:
         if fmt.magic_bytes is not None:
             for magic in fmt.magic_bytes:
                 self.max_magic_bytes = max(self.max_magic_bytes, len(magic))
-                self.magic_bytes[magic[0]].append((fmt.name, magic[1:]))
+                candidates = self.magic_bytes[magic[0]]
+                candidates.append((fmt.name, bytes(magic)))
+                # check candidates by decreasing header length
+                candidates.sort(key=lambda x: len(x[1]), reverse=True)
 
         for mime in fmt.mime_types:
             self.mime_types[mime] = fmt.name
@@ -867,17 +949,21 @@ class Formats:
         return tuple(self.compression_formats.keys())
 
     def list_extensions(self, with_sep: bool = False) -> Iterable[str]:
-        """Returns an iterable with all valid extensions.
+        """Returns an iterable with all valid extensions. The extensions are
+        cached until another format is registered; each call returns a new set
+        that the caller is free to modify.
 
         Args:
             with_sep: Add separator prefix to each extension.
         """
-        exts: Set[str] = set()
-        for fmt in self.compression_formats.values():
-            exts.update(fmt.exts)
-        if with_sep:
-            exts = set("{}{}".format(os.extsep, ext) for ext in exts)
-        return exts
+        if with_sep not in self._extensions:
+            exts: Set[str] = set()
+            for fmt in self.compression_formats.values():
+                exts.update(fmt.exts)
+            if with_sep:
+                exts = set("{}{}".format(os.extsep, ext) for ext in exts)
+            self._extensions[with_sep] = frozenset(exts)
+        return set(self._extensions[with_sep])
 
     def has_compatible_extension(self, dest_fmt, ext_fmt) -> bool:
         """Checks that `dest_fmt` is allowed to use a file extension supported by
@@ -969,22 +1055,10 @@ class Formats:
         Returns:
             The format name, or ``None`` if it could not be guessed.
         """
-        num_bytes = len(header_bytes)
-        if num_bytes > 0:
-            if header_bytes[0] in self.magic_bytes.keys():
-                # check candidates by decreasing header length
-                candidates = sorted(
-                    self.magic_bytes[header_bytes[0]],
-                    key=lambda x: len(x[1]),
-                    reverse=True,
-                )
-                for fmt, tail in candidates:
-                    if (
-                        num_bytes > len(tail)
-                        and tuple(header_bytes[i] for i in range(1, len(tail) + 1))
-                        == tail
-                    ):
-                        return fmt
+        if header_bytes:
+            for fmt, magic in self.magic_bytes.get(header_bytes[0], ()):
+                if header_bytes.startswith(magic):
+                    return fmt
         return None
 
     def get_format_for_mime_type(self, mime_type: str) -> str:
@@ -1143,15 +1217,20 @@ class DualExeCompressionFormat(
         src: PurePath = STDIN,
         stdout: bool = True,
         compresslevel: Optional[int] = None,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         if operation == "c":
-            return self.get_compress_command(src, stdout, compresslevel)
+            return self.get_compress_command(src, stdout, compresslevel, threads)
         else:
-            return self.get_decompress_command(src, stdout)
+            return self.get_decompress_command(src, stdout, threads)
 
     @abstractmethod
     def get_compress_command(
-        self, src: PurePath = STDIN, stdout: bool = True, compresslevel: int = None
+        self,
+        src: PurePath = STDIN,
+        stdout: bool = True,
+        compresslevel: int = None,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         """Build the compress command for the system executable.
 
@@ -1160,6 +1239,8 @@ class DualExeCompressionFormat(
                 stdin
             stdout: Whether output should go to stdout
             compresslevel: Integer compression level; typically 1-9
+            threads: Number of threads to use, for executables that support
+                multi-threading.
 
         Returns:
             List of command arguments
@@ -1168,7 +1249,10 @@ class DualExeCompressionFormat(
 
     @abstractmethod
     def get_decompress_command(
-        self, src: PurePath = STDIN, stdout: bool = True
+        self,
+        src: PurePath = STDIN,
+        stdout: bool = True,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         """Build the decompress command for the system executable.
 
@@ -1176,6 +1260,8 @@ class DualExeCompressionFormat(
             src: The source file path, or STDIN if input should be read from
                 stdin
             stdout: Whether output should go to stdout
+            threads: Number of threads to use, for executables that support
+                multi-threading.
 
         Returns:
             List of command arguments
@@ -1251,6 +1337,7 @@ class Gzip(SingleExeCompressionFormat):
         src: PurePath = STDIN,
         stdout: bool = True,
         compresslevel: int = None,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         cmd = [str(self.executable_path)]
         if operation == "c":
@@ -1262,7 +1349,7 @@ class Gzip(SingleExeCompressionFormat):
             cmd.append("-c")
         if operation == "c":
             # multi-threading only works for compression
-            threads = THREADS.threads
+            threads = THREADS.resolve(threads)
             if self.executable_name == "igzip" and threads > 1:
                 cmd.extend(("-T", str(threads)))
             elif self.executable_name == "pigz" and threads > 1:
@@ -1309,18 +1396,39 @@ class Gzip(SingleExeCompressionFormat):
 
         return compressed, uncompressed, ratio
 
+    def compress(self, raw_bytes: bytes, **kwargs) -> bytes:
+        level = self._get_compresslevel(kwargs.get("compresslevel", None))
+        kwargs["compresslevel"] = level
+        # python-isal is faster, but does not support the higher levels. Files
+        # are always opened with gzip, since igzip can only read from files
+        # that support readinto.
+        if _ISAL_IGZIP and level <= ISAL_MAX_COMPRESSLEVEL:
+            return _ISAL_IGZIP.compress(raw_bytes, **kwargs)
+        return self.lib.compress(raw_bytes, **kwargs)
+
+    def decompress(self, compressed_bytes, **kwargs) -> bytes:
+        return (_ISAL_IGZIP or self.lib).decompress(compressed_bytes, **kwargs)
+
     def open_file_python(
-        self, path_or_file: PathOrFile, mode: ModeArg, **kwargs
+        self,
+        path_or_file: PathOrFile,
+        mode: ModeArg,
+        threads: Optional[Union[bool, int]] = None,
+        **kwargs,
     ) -> FileLike:
-        # pylint: disable=redefined-variable-type
+        # pylint: disable=redefined-variable-type, unused-argument
         if isinstance(mode, str):
             mode = FileMode(mode)
         compressed_file = self.lib.open(path_or_file, mode.value, **kwargs)
         if mode.binary:
             if mode.readable:
-                compressed_file = io.BufferedReader(compressed_file)
+                compressed_file = io.BufferedReader(
+                    compressed_file, buffer_size=PYTHON_BUFFER_SIZE
+                )
             else:
-                compressed_file = io.BufferedWriter(compressed_file)
+                compressed_file = io.BufferedWriter(
+                    compressed_file, buffer_size=PYTHON_BUFFER_SIZE
+                )
         return compressed_file
 
 
@@ -1384,7 +1492,11 @@ class BGzip(DualExeCompressionFormat):
         return 1, 9
 
     def get_compress_command(
-        self, src: PurePath = STDIN, stdout: bool = True, compresslevel: int = None
+        self,
+        src: PurePath = STDIN,
+        stdout: bool = True,
+        compresslevel: int = None,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         cmd = [str(self.compress_path)]
         compress_level = self._get_compresslevel(compresslevel)
@@ -1392,7 +1504,7 @@ class BGzip(DualExeCompressionFormat):
             cmd.extend(("-l", str(compress_level)))
         if stdout:
             cmd.append("-c")
-        threads = THREADS.threads
+        threads = THREADS.resolve(threads)
         if threads > 1:
             cmd.extend(("-@", str(threads)))
         if src != STDIN:
@@ -1400,7 +1512,10 @@ class BGzip(DualExeCompressionFormat):
         return cmd
 
     def get_decompress_command(
-        self, src: PurePath = STDIN, stdout: bool = True
+        self,
+        src: PurePath = STDIN,
+        stdout: bool = True,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         cmd = [str(self.decompress_path), "-d"]
         if stdout:
@@ -1413,9 +1528,13 @@ class BGzip(DualExeCompressionFormat):
         return cmd
 
     def open_file_python(
-        self, path_or_file: PathOrFile, mode: ModeArg, **kwargs
+        self,
+        path_or_file: PathOrFile,
+        mode: ModeArg,
+        threads: Optional[Union[bool, int]] = None,
+        **kwargs,
     ) -> FileLike:
-        # pylint: disable=redefined-variable-type
+        # pylint: disable=redefined-variable-type, unused-argument
         if isinstance(mode, str):
             mode = FileMode(mode)
         if mode.writable:
@@ -1480,6 +1599,7 @@ class Zstd(SingleExeCompressionFormat):
         src: PurePath = STDIN,
         stdout: bool = True,
         compresslevel: int = None,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         cmd = [str(self.executable_path)]
         if operation == "c":
@@ -1491,7 +1611,7 @@ class Zstd(SingleExeCompressionFormat):
             cmd.append("-d")
         if stdout:
             cmd.append("-c")
-        threads = THREADS.threads
+        threads = THREADS.resolve(threads)
         if threads == 1:
             cmd.append(f"--single-thread")
         elif threads > 1:
@@ -1510,7 +1630,11 @@ class Zstd(SingleExeCompressionFormat):
         return int(parsed[0]), int(parsed[1]), ratio
 
     def open_file_python(
-        self, path_or_file: PathOrFile, mode: ModeArg, **kwargs
+        self,
+        path_or_file: PathOrFile,
+        mode: ModeArg,
+        threads: Optional[Union[bool, int]] = None,
+        **kwargs,
     ) -> FileLike:
         # pylint: disable=redefined-variable-type
         if isinstance(mode, str):
@@ -1519,11 +1643,17 @@ class Zstd(SingleExeCompressionFormat):
             raw_mode = mode
         else:
             raw_mode = FileMode(access=mode.access, coding=ModeCoding.BINARY)
+        compresslevel = self._get_compresslevel(kwargs.pop("compresslevel", None))
         raw_file = open(path_or_file, raw_mode.value, **kwargs)
         if mode.readable:
             compressed_file = self.lib.ZstdDecompressor().stream_reader(raw_file)
         else:
-            compressed_file = self.lib.ZstdCompressor().stream_writer(raw_file)
+            # zstandard compresses in its own worker threads when threads > 0;
+            # 0 means compress in the calling thread
+            threads = THREADS.resolve(threads)
+            compressed_file = self.lib.ZstdCompressor(
+                level=compresslevel, threads=threads if threads > 1 else 0
+            ).stream_writer(raw_file)
         if not mode.binary:
             compressed_file = io.TextIOWrapper(compressed_file)
         elif mode.readable:
@@ -1576,6 +1706,7 @@ class BZip2(SingleExeCompressionFormat):
         src: PurePath = STDIN,
         stdout: bool = True,
         compresslevel: Optional[int] = 6,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         cmd = [str(self.executable_path)]
         if operation == "c":
@@ -1586,7 +1717,7 @@ class BZip2(SingleExeCompressionFormat):
             cmd.append("-d")
         if stdout:
             cmd.append("-c")
-        threads = THREADS.threads
+        threads = THREADS.resolve(threads)
         if self.executable_name == "pbzip2" and threads > 1:
             cmd.append("-p{}".format(threads))
         if src != STDIN:
@@ -1595,8 +1726,13 @@ class BZip2(SingleExeCompressionFormat):
 
     # noinspection PyTypeChecker
     def open_file_python(
-        self, path_or_file: PathOrFile, mode: ModeArg, **kwargs
+        self,
+        path_or_file: PathOrFile,
+        mode: ModeArg,
+        threads: Optional[Union[bool, int]] = None,
+        **kwargs,
     ) -> FileLike:
+        # pylint: disable=unused-argument
         if isinstance(mode, str):
             mode = FileMode(mode)
         if mode.text:
@@ -1655,6 +1791,7 @@ class Lzma(SingleExeCompressionFormat):
         src: PurePath = STDIN,
         stdout: bool = True,
         compresslevel: Optional[int] = 6,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         cmd = [str(self.executable_path)]
         if operation == "c":
@@ -1665,7 +1802,7 @@ class Lzma(SingleExeCompressionFormat):
             cmd.append("-d")
         if stdout:
             cmd.append("-c")
-        threads = THREADS.threads
+        threads = THREADS.resolve(threads)
         if threads > 1:
             cmd.extend(("-T", str(threads)))
         if src != STDIN:
@@ -1755,6 +1892,7 @@ class Brotli(SingleExeCompressionFormat):
         src: PurePath = STDIN,
         stdout: bool = True,
         compresslevel: Optional[int] = 6,
+        threads: Optional[Union[bool, int]] = None,
     ) -> List[str]:
         cmd = [str(self.executable_path)]
         if operation == "c":
@@ -1769,8 +1907,13 @@ class Brotli(SingleExeCompressionFormat):
         return cmd
 
     def open_file_python(
-        self, path_or_file: PathOrFile, mode: ModeArg, **kwargs
+        self,
+        path_or_file: PathOrFile,
+        mode: ModeArg,
+        threads: Optional[Union[bool, int]] = None,
+        **kwargs,
     ) -> FileLike:
+        # pylint: disable=unused-argument
         raise UnsupportedOperation(
             "the brotli python library does not have an open() function"
         )
@@ -34,6 +34,7 @@ from typing import (
     overload,
 )
 import warnings
+import weakref
 from xphyle.types import (
     FileMode,
     ModeArg,
@@ -106,40 +107,24 @@ def deprecated_str_to_path(
                     raise ValueError("'args_to_convert' must be ints or strings")
 
             if list_args is not None:
-
-                def convert_list_arg(l):
-                    global warn
-                    for i in range(len(l)):
-                        if isinstance(l[i], str):
-                            warn = True
-                            l[i] = as_pure_path(l[i])
-
                 for idx in list_args:
                     if isinstance(idx, int):
                         if len(args) > idx and isinstance(args[idx], list):
-                            convert_list_arg(new_args[idx])
+                            warn |= _convert_list_arg(new_args[idx])
                     elif isinstance(idx, str):
                         if idx in kwargs and isinstance(kwargs[idx], list):
-                            convert_list_arg(kwargs[idx])
+                            warn |= _convert_list_arg(kwargs[idx])
                     else:
                         raise ValueError("'list_args' must be ints or strings")
 
             if dict_args is not None:
-
-                def convert_dict_arg(d):
-                    global warn
-                    for key in d.keys():
-                        if isinstance(d[key], str):
-                            warn = True
-                            d[key] = as_pure_path(d[key])
-
                 for idx in dict_args:
                     if isinstance(idx, int):
                         if len(args) > idx and isinstance(args[idx], dict):
-                            convert_dict_arg(args[idx])
+                            warn |= _convert_dict_arg(args[idx])
                     elif isinstance(idx, str):
                         if idx in kwargs and isinstance(kwargs[idx], dict):
-                            convert_dict_arg(kwargs[idx])
+                            warn |= _convert_dict_arg(kwargs[idx])
                     else:
                         raise ValueError("'dict_args' must be ints or strings")
 
@@ -157,6 +142,34 @@ def deprecated_str_to_path(
     return decorate
 
 
+def _convert_list_arg(lst: list) -> bool:
+    """Converts string elements of a list to paths in place.
+
+    Returns:
+        Whether any elements were converted.
+    """
+    converted = False
+    for i, val in enumerate(lst):
+        if isinstance(val, str):
+            converted = True
+            lst[i] = as_pure_path(val)
+    return converted
+
+
+def _convert_dict_arg(dct: dict) -> bool:
+    """Converts string values of a dict to paths in place.
+
+    Returns:
+        Whether any values were converted.
+    """
+    converted = False
+    for key, val in dct.items():
+        if isinstance(val, str):
+            converted = True
+            dct[key] = as_pure_path(val)
+    return converted
+
+
 def deprecated(msg: str):
     """
     Issues a deprecation warning:
@@ -503,8 +516,8 @@ def check_path(
             path_type = PathType(path_type)
 
         if not check_std(path):
-            path = cast(Path, path)
-            is_dir = path.resolve().is_dir()
+            # path has already been resolved by resolve_path
+            is_dir = cast(Path, path).is_dir()
 
             if path_type == PathType.FILE and is_dir:
                 raise IOError(errno.EISDIR, f"{path} not a file", path)
@@ -721,6 +734,7 @@ class ExecutableCache(object):
             paths = tuple(paths)
 
         self.search_path = paths + self.search_path
+        self._clear_misses()
 
     @deprecated_str_to_path(list_args=(0, "default_path"))
     def reset_search_path(self, default_path: Iterable[PurePath] = None) -> None:
@@ -732,11 +746,20 @@ class ExecutableCache(object):
         if default_path is None:
             default_path = DEFAULT_EXEC_PATH
         self.search_path = ()
+        self._clear_misses()
         if default_path:
             self.add_search_path(default_path)
 
+    def _clear_misses(self) -> None:
+        """Forget executables that could not be found, since they might be
+        found in a new search path. Executables that were found are kept.
+        """
+        for name in [name for name, path in self.cache.items() if path is None]:
+            del self.cache[name]
+
     def get_path(self, executable: Union[str, PurePath]) -> Path:
-        """Get the full path of `executable`.
+        """Get the full path of `executable`. Both found and missing
+        executables are cached until the search path changes.
 
         Args:
             executable: A executable name or path.
@@ -848,7 +871,8 @@ class TempPath(metaclass=ABCMeta):
         """Whether the directory exists.
         """
         # pylint: disable=no-member
-        return self.absolute_path.exists()
+        # access(F_OK) is cheaper than a stat when only existence matters
+        return os.access(self.absolute_path, os.F_OK)
 
     @property
     def permissions(self) -> PermissionSet:
@@ -982,13 +1006,35 @@ class TempPathDescriptor(TempPath):
             # this using a subprocess to pipe through a buffering program (such
             # as pv) to the FIFO instead
             if self.path_type != PathType.FIFO:
-                with open(self.absolute_path, "wt") as outfile:
-                    outfile.write(self.contents or "")
+                self.write_contents(self.absolute_path, apply_permissions)
+                return
         elif not os.path.exists(self.absolute_path):
             self.absolute_path.mkdir()
         if apply_permissions:
             self.set_permissions()
 
+    def write_contents(
+        self, path_or_fd: Union[Path, int], apply_permissions: bool = True
+    ) -> None:
+        """Write `self.contents` to a file, and optionally set its permissions.
+        When possible, permissions are set using the open file descriptor
+        rather than by resolving the path again.
+
+        Args:
+            path_or_fd: The path of the file, or an open file descriptor, which
+                is closed after writing.
+            apply_permissions: Whether to set permissions according to
+                `self.permissions`.
+        """
+        with open(path_or_fd, "wt") as outfile:
+            if self.contents:
+                outfile.write(self.contents)
+            if apply_permissions and hasattr(os, "fchmod"):
+                os.fchmod(outfile.fileno(), self.permissions.stat_flags)
+                apply_permissions = False
+        if apply_permissions:  # pragma: no-cover
+            self.set_permissions()
+
     def __str__(self):
         return f"TempPathDescriptor({self.name}, {self.path_type})"
 
@@ -1018,6 +1064,26 @@ class TempPathManager:
         self.paths.clear()
 
 
+def _remove_temp_dir(path: str) -> None:
+    """Make all directories under `path` accessible, then remove the tree.
+    This is the finalizer for TempDirs that are never closed, so it only has
+    the path to go on, not the TempDir's descriptors.
+
+    Args:
+        path: The root of the temporary directory.
+    """
+    if not os.path.exists(path):
+        return
+    os.chmod(path, stat.S_IRWXU)
+    # os.walk is top-down, so each directory is made listable before it is
+    # visited
+    for parent, dirs, files in os.walk(path):
+        names = dirs + files if os.name == "nt" else dirs
+        for name in names:
+            os.chmod(os.path.join(parent, name), stat.S_IRWXU)
+    shutil.rmtree(path, ignore_errors=True)
+
+
 class TempDir(TempPathManager, TempPath):
     """Context manager that creates a temporary directory and cleans it up
     upon exit.
@@ -1044,6 +1110,11 @@ class TempDir(TempPathManager, TempPath):
         TempPath.__init__(self, permissions=permissions)
         self._absolute_path = as_path(abspath(Path(tempfile.mkdtemp(**kwargs))))
         self._relative_path = Path("")
+        # make sure the directory is removed even if close() is never called;
+        # the finalizer only holds the path, so it does not keep self alive
+        self._finalizer = weakref.finalize(
+            self, _remove_temp_dir, str(self._absolute_path)
+        )
         if path_descriptors:
             self.make_paths(*path_descriptors)
         self.set_permissions()
@@ -1065,11 +1136,16 @@ class TempDir(TempPathManager, TempPath):
     def close(self) -> None:
         """Delete the temporary directory and all files/subdirectories within.
         """
+        self._finalizer.detach()
         if not self.exists:
             return
-        # First need to make all paths removable
+        # First need to make all paths removable. On POSIX, removing a file
+        # only requires permissions on its directory, so only directories
+        # need to be updated (parents are always added before their children).
+        self.set_permissions("rwx")
         for path in iter(self):
-            path.set_permissions("rwx", True)
+            if path.path_type == PathType.DIR or os.name == "nt":
+                path.set_permissions("rwx")
         shutil.rmtree(str(self.absolute_path))
         self.clear()
 
@@ -1098,20 +1174,28 @@ class TempDir(TempPathManager, TempPath):
             desc.parent = self
 
         # Determine the name of the new file/directory
+        created = False
         if not desc.name:
             parent = desc.parent.absolute_path
             if desc.path_type == PathType.DIR:
                 path = tempfile.mkdtemp(
                     prefix=desc.prefix, suffix=desc.suffix, dir=str(parent)
                 )
-                desc.name = os.path.basename(path)
             else:
-                path = tempfile.mkstemp(
+                fd, path = tempfile.mkstemp(
                     prefix=desc.prefix, suffix=desc.suffix, dir=str(parent)
-                )[1]
-                desc.name = os.path.basename(path)
+                )
+                if desc.path_type == PathType.FILE:
+                    # mkstemp has already created the file; write the contents
+                    # using its descriptor rather than opening the file again
+                    desc.write_contents(fd, apply_permissions)
+                    created = True
+                else:
+                    os.close(fd)
+            desc.name = os.path.basename(path)
 
-        desc.create(apply_permissions)
+        if not created:
+            desc.create(apply_permissions)
 
         self[desc.absolute_path] = desc
         self[desc.relative_path] = desc
@@ -1636,8 +1720,12 @@ class PathSpec:
             dir_spec_str = dir_spec.pattern.pattern
             if dir_spec_str.endswith("$"):
                 dir_spec_str = dir_spec_str[:-1]
-        self.pattern = os.path.join(
-            dir_spec_str, file_spec if self.fixed_file else file_spec.pattern.pattern
+        # compiled once here rather than on every call to `find`
+        self.pattern = re.compile(
+            os.path.join(
+                dir_spec_str,
+                file_spec if self.fixed_file else file_spec.pattern.pattern,
+            )
         )
 
         self.path_vars: Dict[str, PathVar] = {}
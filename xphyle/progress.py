@@ -3,10 +3,15 @@
 By default, pokrok is used for python-level operations and pv for system-level
 operations.
 """
+from functools import partial
+import os
 from os import PathLike
+import queue
 import shlex
+import shutil
 from subprocess import Popen, PIPE
-from typing import Iterable, Union, Callable, Tuple, Sequence, Optional
+import threading
+from typing import Iterable, Union, Callable, Tuple, Sequence, Optional, List
 from pokrok import progress_iter
 from xphyle.paths import EXECUTABLE_CACHE, check_path
 from xphyle.types import PathType, Permission, FileLike
@@ -197,17 +202,98 @@ def iter_file_chunked(fileobj: FileLike, chunksize: int = 1024) -> Iterable:
     Returns:
         An iterable over the chunks of the file.
     """
+    _advise_sequential(fileobj)
 
     def _itr():
-        while True:
-            data = fileobj.read(chunksize)
-            if data:
-                yield data
-            else:
-                break
+        data = fileobj.read(chunksize)
+        if data:
+            yield data
+            # data[:0] is an empty bytes/str sentinel matching the file mode
+            yield from iter(partial(fileobj.read, chunksize), data[:0])
 
     name = None
     if hasattr(fileobj, "name"):
         name = getattr(fileobj, "name")
 
     return ITERABLE_PROGRESS.wrap(_itr(), desc=name)
+
+
+def copy_file_chunked(
+    source: FileLike,
+    dest: FileLike,
+    chunksize: int = 1024 * 1024,
+    pipelined: bool = False,
+) -> None:
+    """Copies the contents of one file to another. If a progress bar is enabled,
+    the chunks are read via :method:`iter_file_chunked`, otherwise
+    `shutil.copyfileobj` is used, which avoids python-level iteration.
+
+    Args:
+        source: A readable file-like object.
+        dest: A writable file-like object.
+        chunksize: The maximum size in bytes of each chunk.
+        pipelined: Whether to read from `source` in a background thread, so
+            that reading overlaps with writing. This is useful when `dest`
+            compresses the data, since the python compression libraries
+            release the GIL while compressing.
+    """
+    if ITERABLE_PROGRESS.enabled:
+        for chunk in iter_file_chunked(source, chunksize):
+            dest.write(chunk)
+    elif pipelined:
+        _copy_file_pipelined(source, dest, chunksize)
+    else:
+        _advise_sequential(source)
+        shutil.copyfileobj(source, dest, chunksize)
+
+
+def _advise_sequential(fileobj: FileLike) -> None:
+    """Hint to the OS that a file will be read sequentially, so that it reads
+    ahead more aggressively. Does nothing if the platform does not support
+    `os.posix_fadvise` or the file is not backed by a regular file.
+
+    Args:
+        fileobj: The file that will be read.
+    """
+    if not hasattr(os, "posix_fadvise"):  # pragma: no-cover
+        return
+    try:
+        os.posix_fadvise(fileobj.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    except (AttributeError, OSError, ValueError):
+        pass
+
+
+def _copy_file_pipelined(
+    source: FileLike, dest: FileLike, chunksize: int, queue_size: int = 4
+) -> None:
+    chunks: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    read_errors: List[BaseException] = []
+
+    def _read():
+        try:
+            for chunk in iter_file_chunked(source, chunksize):
+                if stop.is_set():
+                    break
+                chunks.put(chunk)
+        except BaseException as err:  # pylint: disable=broad-except
+            read_errors.append(err)
+        finally:
+            chunks.put(None)
+
+    reader = threading.Thread(target=_read, daemon=True)
+    reader.start()
+    try:
+        for chunk in iter(chunks.get, None):
+            dest.write(chunk)
+    finally:
+        stop.set()
+        # If writing failed, the reader may be blocked on a full queue
+        while reader.is_alive():
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        reader.join()
+    if read_errors:
+        raise read_errors[0]
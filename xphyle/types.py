@@ -15,6 +15,7 @@ from typing import (
     List,
     Tuple,
     Set,
+    Optional,
     Iterator,
     Iterable,
     Text,
@@ -287,6 +288,7 @@ class PermissionSet(object):
         self, flags: Union[PermissionArg, Iterable[PermissionArg]] = None
     ) -> None:
         self.flags: Set[Permission] = set()
+        self._stat_flags: Optional[int] = None
         if flags:
             if isinstance(flags, str) or is_iterable(flags):
                 self.update(cast(Iterable[PermissionArg], flags))
@@ -299,6 +301,7 @@ class PermissionSet(object):
         Args:
             flag: Permission to add.
         """
+        self._stat_flags = None
         if isinstance(flag, str):
             self.flags.add(Permission(flag))
         elif isinstance(flag, int):
@@ -325,12 +328,15 @@ class PermissionSet(object):
     @property
     def stat_flags(self) -> int:
         """Returns the binary OR of the :module:`stat` flags corresponding to
-        the flags in this `PermissionSet`.
+        the flags in this `PermissionSet`. The value is computed once and
+        reused (e.g. for every chmod) until the set is modified.
         """
-        flags = 0
-        for f in self.flags:
-            flags |= f.stat_flag
-        return flags
+        if self._stat_flags is None:
+            flags = 0
+            for f in self.flags:
+                flags |= f.stat_flag
+            self._stat_flags = flags
+        return self._stat_flags
 
     @property
     def os_flags(self) -> int:
@@ -422,6 +428,20 @@ class FileLikeBase(FileLikeInterface):
     def read(self, n: int = -1) -> AnyChar:
         raise UnsupportedOperation()
 
+    def readinto(self, buffer: bytearray) -> int:
+        """Read up to `len(buffer)` bytes into `buffer`, using `read`.
+
+        Args:
+            buffer: The buffer to read into.
+
+        Returns:
+            The number of bytes read; 0 at end of file.
+        """
+        data = self.read(len(buffer))
+        num_bytes = len(data)
+        buffer[:num_bytes] = data
+        return num_bytes
+
     def readline(self, hint: int = -1) -> AnyChar:
         raise UnsupportedOperation()
 
@@ -7,18 +7,21 @@ handled gracefully.
 from abc import ABCMeta, abstractmethod
 from collections import OrderedDict
 from collections.abc import Sized
+from contextlib import ExitStack
 import copy
 import csv
-from itertools import cycle
+from importlib import import_module
+from itertools import islice
+from operator import itemgetter
 import os
 from pathlib import PurePath, Path
 import shutil
 import sys
 from typing import (
+    AnyStr,
     Generator,
     Callable,
     Dict,
-    List,
     Tuple,
     Any,
     Sequence,
@@ -32,7 +35,7 @@ from typing import (
 from xphyle import open_, xopen, FileWrapper, Process, popen, EventListener
 from xphyle.formats import FORMATS
 from xphyle.paths import STDIN, STDOUT, deprecated_str_to_path
-from xphyle.progress import iter_file_chunked
+from xphyle.progress import ITERABLE_PROGRESS, iter_file_chunked, copy_file_chunked
 from xphyle.types import (
     PathOrFile,
     FileLike,
@@ -75,9 +78,12 @@ def read_lines(
         if fileobj is None:
             return
         itr = cast(Iterator[str], fileobj)
-        if strip_linesep:
+        # Use a single generator so each line passes through one python frame
+        if strip_linesep and convert:
+            itr = (convert(line.rstrip()) for line in itr)
+        elif strip_linesep:
             itr = (line.rstrip() for line in itr)
-        if convert:
+        elif convert:
             itr = (convert(line) for line in itr)
         yield from itr
 
@@ -131,15 +137,10 @@ def write_lines(
         linesep = os.linesep
     if "mode" not in kwargs:
         kwargs["mode"] = "wt"
-    written = 0
     with open_(path_or_file, **kwargs) as fileobj:
         if fileobj is None:
             return -1
-        for line in iterable:
-            if written > 0:
-                written += fileobj.write(linesep)
-            written += fileobj.write(convert(line))
-    return written
+        return _write_joined(fileobj, map(convert, iterable), linesep)
 
 
 def to_bytes(value: Any, encoding: str = "utf-8"):
@@ -182,15 +183,36 @@ def write_bytes(
         sep = convert(os.linesep)
     if "mode" not in kwargs:
         kwargs["mode"] = "wb"
-    written = 0
     with open_(path_or_file, **kwargs) as fileobj:
         if fileobj is None:
             return -1
-        for chunk in iterable:
-            if written > 0:
-                written += fileobj.write(sep)
-            written += fileobj.write(convert(chunk))
-    return written
+        return _write_joined(fileobj, map(convert, iterable), sep)
+
+
+def _write_joined(
+    fileobj: FileLike, items: Iterator[AnyStr], sep: AnyStr, batch_size: int = 1024
+) -> int:
+    """Write `sep`-separated items to a file. Items are joined in batches of
+    `batch_size`, so there is one write call per batch rather than two per
+    item, without reading the entire iterator into memory.
+
+    Args:
+        fileobj: The file to write to.
+        items: An iterator over strings or bytes.
+        sep: The separator.
+        batch_size: The number of items to join per write.
+
+    Returns:
+        Total number of characters/bytes written.
+    """
+    written = 0
+    prefix = sep[:0]
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return written
+        written += fileobj.write(prefix + sep.join(batch))
+        prefix = sep
 
 
 # key=value files
@@ -220,20 +242,23 @@ def read_dict(
 
     Returns:
         An OrderedDict, if 'ordered' is True, otherwise a dict.
+
+    Raises:
+        ValueError if a line does not contain `sep`.
     """
 
-    def _parse_line(line: str) -> Optional[List[str]]:
-        line = line.strip()
-        if len(line) == 0 or line[0] == "#":
-            return None
-        return line.split(sep)
+    def _parse_lines() -> Iterator[Tuple[str, Any]]:
+        for line in read_lines(path_or_file, **kwargs):
+            line = line.lstrip()
+            if line and line[0] != "#":
+                # partition splits only at the first separator, so values may
+                # contain the separator
+                key, found, value = line.partition(sep)
+                if not found:
+                    raise ValueError(f"Missing separator {sep!r} in line {line!r}")
+                yield key, convert(value) if convert else value
 
-    lines = (
-        (line[0], convert(line[1]) if convert else line[1])
-        for line in read_lines(path_or_file, convert=_parse_line, **kwargs)
-        if line is not None
-    )
-    return OrderedDict(lines) if ordered else dict(lines)
+    return OrderedDict(_parse_lines()) if ordered else dict(_parse_lines())
 
 
 @deprecated_str_to_path(1, "path_or_file")
@@ -261,7 +286,7 @@ def write_dict(
     """
     if linesep is None:
         linesep = os.linesep
-    lines = ("{}{}{}".format(key, sep, convert(val)) for key, val in dictobj.items())
+    lines = (f"{key}{sep}{convert(val)}" for key, val in dictobj.items())
     return write_lines(lines, path_or_file, linesep=linesep, **kwargs)
 
 
@@ -314,24 +339,25 @@ def read_delimited(
 
         if converters:
             if is_iterable(converters):
-                converter_itr = cast(Iterable[FromStrFunc], converters)
+                # Materialize once so that one-shot iterables apply to every row
+                converter_tuple = tuple(cast(Iterable[FromStrFunc], converters))
+                reader = (
+                    [fn(x) if fn else x for fn, x in zip(converter_tuple, row)]
+                    for row in reader
+                )
             elif callable(converters):
-                converter_itr = cycle([converters])
+                converter = cast(FromStrFunc, converters)
+                reader = ([converter(x) for x in row] for row in reader)
             else:
                 raise ValueError("'converters' must be iterable or callable")
 
-            reader = (
-                [fn(x) if fn else x for fn, x in zip(converter_itr, row)]
-                for row in reader
-            )
-
         if row_type == "tuple":
-            reader = (tuple(row) for row in reader)
+            reader = map(tuple, reader)
         elif row_type == "dict":
             if header_row is not None:
                 reader = (dict(zip(header_row, row)) for row in reader)
         elif callable(row_type):
-            reader = (row_type(row) for row in reader)
+            reader = map(row_type, reader)
 
         yield from reader
 
@@ -342,6 +368,7 @@ def read_delimited_as_dict(
     sep: str = "\t",
     header: Union[bool, Sequence[str]] = False,
     key: Union[int, str, RowFunc] = 0,
+    engine: str = "python",
     **kwargs
 ) -> Dict[Any, Any]:
     """Parse rows in a delimited file and add rows to a dict based on a a
@@ -355,14 +382,27 @@ def read_delimited_as_dict(
         key: The column to use as a dict key, or a function to extract the key
           from the row. If a string value, header must be specified. All values
           must be unique, or an exception is raised.
-        kwargs: Additional arguments to pass to `read_delimited`.
+        engine: The parser to use: 'python' uses `read_delimited`; 'pandas'
+            uses `pandas.read_csv` with the C parser, which is much faster for
+            large (more than ~1 MB) files, especially those with many or
+            numeric columns. With 'pandas', `key` must be a column name or
+            index, values are parsed according to pandas' type inference, and
+            each row is a tuple.
+        kwargs: Additional arguments to pass to `read_delimited`, or to
+            `pandas.read_csv` (e.g. `dtype`, `usecols`) if engine='pandas'.
 
     Returns:
         A dict with as many element as rows in the file.
 
     Raises:
-        Exception if a duplicte key is generated.
+        ValueError if a duplicate key is generated.
+        ImportError if engine='pandas' and pandas is not installed.
     """
+    if engine == "pandas":
+        return _read_delimited_as_dict_pandas(path_or_file, sep, header, key, **kwargs)
+    elif engine != "python":
+        raise ValueError(f"Invalid engine {engine}")
+
     itr = None
 
     if isinstance(key, str):
@@ -378,10 +418,7 @@ def read_delimited_as_dict(
 
     # pylint: disable=redefined-variable-type
     if isinstance(key, int):
-
-        def keyfn(_row):
-            return _row[key]
-
+        keyfn = itemgetter(key)
     elif callable(key):
         keyfn = key
     else:
@@ -395,11 +432,46 @@ def read_delimited_as_dict(
     for row in itr:
         k = keyfn(row)
         if k in objects:
-            raise Exception("Duplicate key {}".format(k))
+            raise ValueError("Duplicate key {}".format(k))
         objects[k] = row
     return objects
 
 
+def _read_delimited_as_dict_pandas(
+    path_or_file: PathOrFile,
+    sep: str,
+    header: Union[bool, Sequence[str]],
+    key: Union[int, str, RowFunc],
+    **kwargs
+) -> Dict[Any, Any]:
+    pandas = import_module("pandas")
+
+    if callable(key):
+        raise ValueError("'key' must be a column name or index if engine='pandas'")
+    if isinstance(key, str) and not header:
+        raise ValueError("'header' must be specified if 'key' is a column name")
+
+    if header is True:
+        kwargs["header"] = 0
+    else:
+        kwargs["header"] = None
+        if header:
+            kwargs["names"] = list(cast(Sequence[str], header))
+
+    with open_(path_or_file) as fileobj:
+        if fileobj is None:
+            return {}
+        data = pandas.read_csv(fileobj, sep=sep, engine="c", **kwargs)
+
+    keys = data[key] if isinstance(key, str) else data.iloc[:, key]
+    if not keys.is_unique:
+        raise ValueError("Duplicate key {}".format(keys[keys.duplicated()].iloc[0]))
+    # Convert to object dtype first so that values are python objects rather
+    # than numpy scalars, as they are with the python engine
+    rows = data.to_numpy(dtype=object).tolist()
+    return dict(zip(keys.tolist(), map(tuple, rows)))
+
+
 # Compressed files
 
 
@@ -524,8 +596,53 @@ def transcode_file(
     ) as src, open_(
         dest_file, compression=dest_compression, use_system=use_system, **dst_args
     ) as dst:
-        for chunk in iter_file_chunked(src):
-            dst.write(chunk)
+        # If neither file is compressed, try to copy within the kernel
+        if (
+            src.compression
+            or dst.compression
+            or ITERABLE_PROGRESS.enabled
+            or not _sendfile(src, dst)
+        ):
+            copy_file_chunked(src, dst)
+
+
+def _sendfile(source: FileLike, dest: FileLike, chunksize: int = 1 << 24) -> bool:
+    """Copies the remaining contents of one regular file to another using
+    `os.sendfile`, which avoids copying data through user space.
+
+    Args:
+        source: A readable file-like object.
+        dest: A writable file-like object.
+        chunksize: The maximum number of bytes to send per call.
+
+    Returns:
+        True if the file was copied, or False if sendfile is not supported for
+        these files, in which case nothing has been copied.
+
+    Raises:
+        OSError if sendfile fails after part of the file has been copied. The
+        copy can't be finished by falling back to a regular copy.
+    """
+    if not hasattr(os, "sendfile"):  # pragma: no-cover
+        return False
+    try:
+        in_fd = source.fileno()
+        out_fd = dest.fileno()
+        offset = source.tell()
+    except (AttributeError, OSError, ValueError):
+        return False
+    dest.flush()
+    try:
+        sent = os.sendfile(out_fd, in_fd, offset, chunksize)
+    except OSError:
+        # e.g. the platform only supports sockets as the destination
+        return False
+    # Any error from here on is a real I/O error (e.g. ENOSPC) and propagates
+    while sent:
+        offset += sent
+        sent = os.sendfile(out_fd, in_fd, offset, chunksize)
+    source.seek(offset)
+    return True
 
 
 @deprecated_str_to_path(0, "source_file", 1, "dest_file")
@@ -771,12 +888,16 @@ class FileManager(Sized):
         yield from ((key, self.get(key)) for key in list(self.keys))
 
     def close(self) -> None:
-        """Close all files being tracked."""
+        """Close all files being tracked. Every open file is closed even if
+        closing another file raises an exception; the exception is re-raised
+        after all files have been closed.
+        """
         if not hasattr(self, "_files"):
             return
-        for fileobj in self._files.values():
-            if fileobj and not (isinstance(fileobj, dict) or fileobj.closed):
-                fileobj.close()
+        with ExitStack() as stack:
+            for fileobj in self._files.values():
+                if fileobj and not (isinstance(fileobj, dict) or fileobj.closed):
+                    stack.callback(fileobj.close)
 
 
 class FileInput(FileManager, Generic[CharMode], Iterator[CharMode]):
@@ -1321,7 +1442,7 @@ def byteoutput(
 # Misc
 
 
-@deprecated_str_to_path(1, "path_or_file")
+@deprecated_str_to_path(0, "path_or_file")
 def linecount(
     path_or_file: PathOrFile,
     linesep: Optional[bytes] = None,
@@ -1339,9 +1460,15 @@ def linecount(
     Returns:
         The number of lines in the file. Blank lines (including the last line
         in the file) are included.
+
+    Notes:
+        Data is read into a single, reused buffer, so files that support
+        `readinto` are counted without allocating a new bytes object per
+        chunk. File-like objects that only implement `read` still allocate
+        one per chunk.
     """
     if buffer_size < 1:
-        raise ValueError("'buffer_size' must be >= ")
+        raise ValueError("'buffer_size' must be >= 1")
     if linesep is None:
         linesep = os.linesep.encode()
     if "mode" not in kwargs:
@@ -1351,12 +1478,13 @@ def linecount(
     with open_(path_or_file, **kwargs) as fileobj:
         if fileobj is None:
             return -1
-        read_f = fileobj.read  # loop optimization
-        buf = read_f(buffer_size)
-        if len(buf) == 0:  # undefined file case
+        buf = bytearray(buffer_size)
+        readinto = fileobj.readinto  # loop optimization
+        num_bytes = readinto(buf)
+        if num_bytes == 0:  # undefined file case
             return 0
         lines = 1
-        while buf:
-            lines += buf.count(linesep)
-            buf = read_f(buffer_size)
+        while num_bytes:
+            lines += buf.count(linesep, 0, num_bytes)
+            num_bytes = readinto(buf)
         return lines